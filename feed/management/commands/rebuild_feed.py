@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from feed.models import ActivityEvent, FeedEntry
+from feed.services import follower_ids
+from movies.models import WatchedMovie
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = 'Rebuild activity events from watched movies and reviews, and fan them out to every feed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # List additions carry no timestamp, so only watches and reviews are rebuilt
+        events = [
+            ActivityEvent(actor_id=user_id, verb=ActivityEvent.WATCHED, movie_id=movie_id, created=created)
+            for user_id, movie_id, created in WatchedMovie.objects.values_list('user_id', 'movie_id', 'watched_at')
+        ] + [
+            ActivityEvent(actor_id=user_id, verb=ActivityEvent.REVIEWED, movie_id=movie_id, created=created)
+            for user_id, movie_id, created in Review.objects.values_list('user_id', 'movie_id', 'date')
+        ]
+
+        with transaction.atomic():
+            ActivityEvent.objects.filter(verb__in=[ActivityEvent.WATCHED, ActivityEvent.REVIEWED]).delete()
+            events = ActivityEvent.objects.bulk_create(events, batch_size=batch_size)
+
+            followers = {}
+            entries = []
+            for event in events:
+                if event.actor_id not in followers:
+                    followers[event.actor_id] = follower_ids(event.actor_id)
+                entries.extend(
+                    FeedEntry(recipient_id=recipient_id, event_id=event.pk, actor_id=event.actor_id, created=event.created)
+                    for recipient_id in followers[event.actor_id]
+                )
+            FeedEntry.objects.bulk_create(entries, batch_size=batch_size, ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(events)} events into {len(entries)} feed entries.'))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from lists.models import List
+from movies.models import Movie
+
+
+class ActivityEvent(models.Model):
+    """Something a user did that their friends see in the activity feed."""
+    WATCHED = 'watched'
+    REVIEWED = 'reviewed'
+    LISTED = 'listed'
+    VERB_CHOICES = [
+        (WATCHED, 'watched'),
+        (REVIEWED, 'reviewed'),
+        (LISTED, 'added to a list'),
+    ]
+
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='activity_events')
+    verb = models.CharField(max_length=20, choices=VERB_CHOICES)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    # Only for LISTED events
+    list = models.ForeignKey(List, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['actor', '-created'], name='activity_actor_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} {self.movie_id}"
+
+
+class FeedEntry(models.Model):
+    """
+    One event in one recipient's feed, written when the event happens
+    (fan-out on write) so reading a feed is a range scan on
+    (recipient, created).
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='feed_entries')
+    event = models.ForeignKey(ActivityEvent, on_delete=models.CASCADE, related_name='entries')
+    # Copied from the event so pruning and ordering need no join
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    created = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipient', '-created'], name='feed_recipient_created_idx'),
+            models.Index(fields=['recipient', 'actor'], name='feed_recipient_actor_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'event'], name='unique_feed_entry')
+        ]
+
+    def __str__(self):
+        return f"FeedEntry(recipient={self.recipient_id}, event={self.event_id})"
@@ -0,0 +1,65 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from .models import ActivityEvent, FeedEntry
+
+# How many recent events of a new friend are copied into the other's feed
+BACKFILL_EVENTS = getattr(settings, 'FEED_BACKFILL_EVENTS', 50)
+
+
+def follower_ids(actor_id):
+    """Ids of the users whose feed shows `actor_id`'s activity (everyone who has them as a friend)."""
+    return list(get_user_model().objects.filter(friends=actor_id).values_list('id', flat=True))
+
+
+def publish(actor_id, verb, movie_id, list_id=None, created=None):
+    """Record an event; `fan_out` (run as a job, see feed.tasks) puts it into the friends' feeds."""
+    return ActivityEvent.objects.create(
+        actor_id=actor_id, verb=verb, movie_id=movie_id, list_id=list_id, created=created or timezone.now(),
+    )
+
+
+def fan_out(event_id):
+    """Write an event into every friend's feed (no-op if it was retracted in the meantime)."""
+    event = ActivityEvent.objects.filter(pk=event_id).values_list('actor_id', 'created').first()
+    if event is None:
+        return
+    actor_id, created = event
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(recipient_id=recipient_id, event_id=event_id, actor_id=actor_id, created=created)
+         for recipient_id in follower_ids(actor_id)],
+        ignore_conflicts=True,
+    )
+
+
+def retract(actor_id, verb, movie_id, list_id=None):
+    """Remove an undone event (unwatched, review deleted, ...) from all feeds."""
+    events = ActivityEvent.objects.filter(actor_id=actor_id, verb=verb, movie_id=movie_id)
+    if list_id is not None:
+        events = events.filter(list_id=list_id)
+    events.delete()
+
+
+def backfill(recipient_id, actor_id, limit=BACKFILL_EVENTS):
+    """Copy `actor_id`'s most recent events into `recipient_id`'s feed (new friendship)."""
+    events = ActivityEvent.objects.filter(actor_id=actor_id).order_by('-created').values_list('id', 'created')[:limit]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(recipient_id=recipient_id, event_id=event_id, actor_id=actor_id, created=created)
+         for event_id, created in events],
+        ignore_conflicts=True,
+    )
+
+
+def prune(recipient_id, actor_ids):
+    """Drop everything `actor_ids` did from `recipient_id`'s feed (friendship ended)."""
+    FeedEntry.objects.filter(recipient_id=recipient_id, actor_id__in=actor_ids).delete()
+
+
+def feed_for(user):
+    """The user's feed, newest first, ready for display."""
+    return (
+        FeedEntry.objects.filter(recipient=user)
+        .select_related('actor', 'event__movie', 'event__list')
+        .order_by('-created')
+    )
@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from lists.models import List
+from movies.models import WatchedMovie
+from reviews.models import Review
+from . import services, tasks
+from .models import ActivityEvent, FeedEntry
+
+
+def _publish(actor_id, verb, movie_id, list_id=None, created=None):
+    event = services.publish(actor_id, verb, movie_id, list_id=list_id, created=created)
+    tasks.fan_out.enqueue(event.pk)
+
+
+@receiver(post_save, sender=WatchedMovie)
+def watched_movie_saved(sender, instance, created, **kwargs):
+    if created:
+        _publish(instance.user_id, ActivityEvent.WATCHED, instance.movie_id, created=instance.watched_at)
+
+
+@receiver(post_delete, sender=WatchedMovie)
+def watched_movie_deleted(sender, instance, **kwargs):
+    services.retract(instance.user_id, ActivityEvent.WATCHED, instance.movie_id)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        _publish(instance.user_id, ActivityEvent.REVIEWED, instance.movie_id, created=instance.date)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    services.retract(instance.user_id, ActivityEvent.REVIEWED, instance.movie_id)
+
+
+@receiver(m2m_changed, sender=List.movies.through)
+def list_movies_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove'):
+        return
+    # reverse: movie.movie_lists.add(list, ...)
+    if reverse:
+        pairs = [(user_id, list_id, instance.pk) for list_id, user_id in
+                 List.objects.filter(pk__in=pk_set).values_list('id', 'user_id')]
+    else:
+        pairs = [(instance.user_id, instance.pk, movie_id) for movie_id in pk_set]
+
+    for user_id, list_id, movie_id in pairs:
+        if action == 'post_add':
+            _publish(user_id, ActivityEvent.LISTED, movie_id, list_id=list_id)
+        else:
+            services.retract(user_id, ActivityEvent.LISTED, movie_id, list_id=list_id)
+
+
+@receiver(m2m_changed, sender=get_user_model().friends.through)
+def friends_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """`a.friends.add(b)` puts b's recent activity into a's feed; removing b takes it out."""
+    if action == 'pre_clear':
+        (FeedEntry.objects.filter(actor=instance) if reverse else FeedEntry.objects.filter(recipient=instance)).delete()
+        return
+    if action not in ('post_add', 'post_remove'):
+        return
+
+    pairs = [(other, instance.pk) if reverse else (instance.pk, other) for other in pk_set]
+    for recipient_id, actor_id in pairs:
+        if action == 'post_add':
+            tasks.backfill_feed.enqueue(
+                recipient_id, actor_id, dedup_key=f'feed-backfill:{recipient_id}:{actor_id}'
+            )
+        else:
+            services.prune(recipient_id, [actor_id])
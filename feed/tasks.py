@@ -0,0 +1,16 @@
+from django.contrib.auth import get_user_model
+
+from jobs.queue import task
+from . import services
+
+
+@task()
+def fan_out(event_id):
+    services.fan_out(event_id)
+
+
+@task()
+def backfill_feed(recipient_id, actor_id):
+    # The friendship may have ended again before this ran
+    if get_user_model().objects.filter(pk=recipient_id, friends=actor_id).exists():
+        services.backfill(recipient_id, actor_id)
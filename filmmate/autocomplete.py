@@ -0,0 +1,119 @@
+"""
+In-memory prefix autocomplete.
+
+Each worker keeps a sorted array of normalized keys per source and answers
+a prefix with two bisects, so keystrokes never touch the database. A
+source is rebuilt when its model changes in this process (signals call
+`invalidate`), and when its stamp moves: a cheap query, run at most every
+`check_seconds`, whose result changes with any edit to the indexed rows,
+so writes made by other workers are picked up too.
+"""
+import bisect
+import threading
+import time
+import unicodedata
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+class PrefixIndex:
+    """
+    Sorted keys for prefix lookups.
+
+    Every entry is indexed under its full text and under each later word, so
+    "wars" finds "Star Wars"; matches on the full text are returned first.
+    """
+
+    def __init__(self, entries):
+        # entries: iterable of (text, payload)
+        self.payloads = []
+        full, words = [], []
+        for text, payload in entries:
+            i = len(self.payloads)
+            self.payloads.append(payload)
+            key = normalize(text)
+            full.append((key, i))
+            for pos in range(1, len(key)):
+                if key[pos - 1] == " " and key[pos] != " ":
+                    words.append((key[pos:], i))
+        full.sort()
+        words.sort()
+        self._full_keys = [k for k, _ in full]
+        self._full_ids = [i for _, i in full]
+        self._word_keys = [k for k, _ in words]
+        self._word_ids = [i for _, i in words]
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @staticmethod
+    def _scan(keys, ids, prefix, limit, seen, out):
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + "\uffff", lo=start)
+        for j in range(start, end):
+            if len(out) >= limit:
+                return
+            i = ids[j]
+            if i not in seen:
+                seen.add(i)
+                out.append(i)
+
+    def search(self, prefix, limit=10):
+        prefix = normalize(prefix).strip()
+        if not prefix:
+            return []
+        seen, out = set(), []
+        self._scan(self._full_keys, self._full_ids, prefix, limit, seen, out)
+        self._scan(self._word_keys, self._word_ids, prefix, limit, seen, out)
+        return [self.payloads[i] for i in out]
+
+
+class AutocompleteSource:
+    """
+    A lazily built, per-worker PrefixIndex over one model.
+
+    `load(queryset)` turns the model's rows into (text, payload) pairs;
+    `fields` are the model fields it reads, so saves that touch none of
+    them (e.g. a login updating last_login) keep the index. `stamp()` must
+    return a value that changes whenever an indexed row is added, edited or
+    deleted; a row count and max id alone miss edits such as a rename.
+    """
+
+    def __init__(self, model, load, fields, stamp, check_seconds=30):
+        self.model = model
+        self.load = load
+        self.fields = set(fields)
+        self.stamp = stamp
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._index = None
+        self._stamp = None
+        self._checked_at = 0.0
+
+    def invalidate(self, update_fields=None, **kwargs):
+        """Drop the index; usable directly as a post_save/post_delete receiver."""
+        if update_fields and not self.fields.intersection(update_fields):
+            return
+        with self._lock:
+            self._index = None
+
+    def get(self):
+        now = time.monotonic()
+        index = self._index
+        if index is not None and now - self._checked_at < self.check_seconds:
+            return index
+        with self._lock:
+            if self._index is not None and now - self._checked_at < self.check_seconds:
+                return self._index
+            stamp = self.stamp()
+            if self._index is None or stamp != self._stamp:
+                self._index = PrefixIndex(self.load(self.model._default_manager.all()))
+                self._stamp = stamp
+            self._checked_at = now
+            return self._index
+
+    def search(self, prefix, limit=10):
+        return self.get().search(prefix, limit)
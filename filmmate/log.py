@@ -0,0 +1,31 @@
+"""
+One JSON object per log line, for the log collector.
+
+Fields passed with `extra={...}` become keys of their own, so
+`logger.warning("Vector search unavailable", extra={"error": str(e)})`
+can be filtered on `error` without parsing the message.
+"""
+import json
+import logging
+
+from .metrics import current_view
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        view = current_view()
+        if view:
+            entry["view"] = view
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
@@ -0,0 +1,286 @@
+"""
+Request timing and counters, exported in the Prometheus text format.
+
+With METRICS_ENABLED, MetricsMiddleware times every request per view and
+counts its ORM queries (through an execute wrapper on every connection), and
+`with span("embed"): ...` blocks time the expensive steps inside a view
+(embedding, vector query, LLM call, template rendering). Latencies are
+summaries: count and sum since start plus 0.5/0.9/0.99 quantiles over the
+latest METRICS_WINDOW observations. Apps add point-in-time gauges (cache
+hit ratios, queue depth) with `register_collector`.
+
+Everything is per worker process, like the cache stats it exports; scrape
+each worker or accept that one is sampled. With metrics disabled the
+middleware removes itself and `span` returns a shared no-op context.
+"""
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+ENABLED = getattr(settings, "METRICS_ENABLED", False)
+# Bearer token for the scraper; without one only staff users can read /metrics/
+TOKEN = getattr(settings, "METRICS_TOKEN", None)
+# Recent observations per series the quantiles are computed from
+WINDOW = getattr(settings, "METRICS_WINDOW", 1024)
+
+PREFIX = "filmmate_"
+QUANTILES = (0.5, 0.9, 0.99)
+
+HELP = {
+    "view_seconds": "Request latency per view",
+    "view_queries": "ORM queries per request, per view",
+    "view_db_seconds": "Time spent in ORM queries per request, per view",
+    "requests_total": "Requests per view and status code",
+    "span_seconds": "Time spent in instrumented steps (embed, vector_query, llm, render), per view",
+    "job_seconds": "Background job run time per task",
+    "jobs_total": "Background job attempts per task and outcome",
+}
+
+
+class Summary:
+    """Count, sum and the latest `window` observations of one labelled series."""
+
+    __slots__ = ("count", "sum", "recent")
+
+    def __init__(self, window=WINDOW):
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {q: values[min(int(q * len(values)), len(values) - 1)] for q in QUANTILES}
+
+
+_lock = threading.Lock()
+_summaries = {}  # (name, labels) -> Summary
+_counters = {}  # (name, labels) -> float
+_collectors = []
+# The current request's view name, query count and query time
+_request = contextvars.ContextVar("metrics_request", default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, value, **labels):
+    """Add one observation to the `name` summary (e.g. a duration in seconds)."""
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        summary = _summaries.get(key)
+        if summary is None:
+            summary = _summaries[key] = Summary()
+        summary.observe(value)
+
+
+def increment(name, amount=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def current_view():
+    """View name of the request being served ("" outside a request)."""
+    state = _request.get()
+    return state["view"] if state else ""
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe("span_seconds", time.perf_counter() - self.started, span=self.name, view=current_view())
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def span(name):
+    """`with span("embed"): ...` times the block under `name` for the current view."""
+    return _Span(name) if ENABLED else _NOOP
+
+
+def register_collector(collector):
+    """
+    Add a callable returning [(name, type, help, [(labels, value), ...]), ...],
+    evaluated on every scrape.
+    """
+    _collectors.append(collector)
+
+
+def _count_query(execute, sql, params, many, context):
+    # The context variable follows the request into sync_to_async threads
+    state = _request.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state["queries"] += 1
+        state["db_seconds"] += time.perf_counter() - started
+
+
+def _add_query_counter(sender=None, connection=None, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+class MetricsMiddleware:
+    """
+    Times requests per view and counts their queries.
+
+    Sync and async capable, so under ASGI it does not push the rest of the
+    chain (and async views such as the streaming chatbot) onto a thread.
+    Queries are counted on every connection rather than the request
+    thread's, since async views run their ORM calls on other threads.
+    For streaming responses only the time to the first byte is measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        connection_created.connect(_add_query_counter, dispatch_uid="metrics_query_counter")
+        for conn in connections.all(initialized_only=True):
+            _add_query_counter(connection=conn)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            # A sync process_view would be run on a thread for every request
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = {"view": "", "queries": 0, "db_seconds": 0.0}
+        token = _request.set(state)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        self._record(state, time.perf_counter() - started, response)
+        return response
+
+    async def __acall__(self, request):
+        state = {"view": "", "queries": 0, "db_seconds": 0.0}
+        token = _request.set(state)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        self._record(state, time.perf_counter() - started, response)
+        return response
+
+    @staticmethod
+    def _record(state, elapsed, response):
+        # Unmatched URLs (404s) share one label instead of one series per path
+        view = state["view"] or "unresolved"
+        observe("view_seconds", elapsed, view=view)
+        observe("view_queries", state["queries"], view=view)
+        observe("view_db_seconds", state["db_seconds"], view=view)
+        increment("requests_total", view=view, status=str(response.status_code))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _request.get()
+        if state is not None:
+            state["view"] = request.resolver_match.view_name
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        MetricsMiddleware.process_view(self, request, view_func, view_args, view_kwargs)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name, labels, value):
+    if labels:
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        return f"{PREFIX}{name}{{{label_text}}} {value}"
+    return f"{PREFIX}{name} {value}"
+
+
+def _header(lines, name, kind, help_text):
+    lines.append(f"# HELP {PREFIX}{name} {help_text}")
+    lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+
+def render_text():
+    """Every metric of this worker in the Prometheus text exposition format."""
+    with _lock:
+        summaries = sorted((key, s.count, s.sum, s.quantiles()) for key, s in _summaries.items())
+        counters = sorted(_counters.items())
+
+    lines = []
+    current = None
+    for (name, labels), count, total, quantiles in summaries:
+        if name != current:
+            _header(lines, name, "summary", HELP.get(name, name))
+            current = name
+        for q, value in quantiles.items():
+            lines.append(_sample(name, labels + (("quantile", q),), value))
+        lines.append(_sample(f"{name}_sum", labels, total))
+        lines.append(_sample(f"{name}_count", labels, count))
+
+    current = None
+    for (name, labels), value in counters:
+        if name != current:
+            _header(lines, name, "counter", HELP.get(name, name))
+            current = name
+        lines.append(_sample(name, labels, value))
+
+    for collector in _collectors:
+        for name, kind, help_text, samples in collector():
+            _header(lines, name, kind, help_text)
+            for labels, value in samples:
+                lines.append(_sample(name, tuple(sorted(labels.items())), value))
+    return "\n".join(lines) + "\n"
+
+
+def _authorized(request):
+    if TOKEN and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {TOKEN}"):
+        return True
+    return request.user.is_active and request.user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (bearer METRICS_TOKEN or a staff session)."""
+    if not ENABLED:
+        raise Http404
+    if not _authorized(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_text(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,230 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of `OFFSET n` plus a `COUNT(*)`, each page remembers the sort key
+of its first and last row in an opaque token; the next page is a range
+query starting after that key, so page 500 costs the same as page 1.
+Ordering always ends with the primary key to keep the key unique.
+"""
+import base64
+import binascii
+import bisect
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+# Counts above this are shown as "N+" instead of being counted exactly
+APPROXIMATE_COUNT_CAP = 1000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its cut to milliseconds: a key must round-trip exactly."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction, values], cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor(f'Invalid cursor: {token!r}') from e
+    if direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor(f'Invalid cursor: {token!r}')
+    return direction, values
+
+
+class CursorPage:
+    """One page of results; iterate it like a Django Page."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor, total=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        # (count, is_exact) when the paginator was asked to count
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Paginate `queryset` by `ordering`, e.g. ('title', 'id') or ('-created', '-id').
+
+    The last field must be unique (normally the primary key). Fields are
+    read from the rows, so they must be concrete fields of the model or
+    annotations.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count=False):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.count = count
+        self._fields = [name.lstrip('-') for name in self.ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, field) for field in self._fields]
+
+    def _parse_values(self, values):
+        if len(values) != len(self._fields):
+            raise InvalidCursor('Cursor does not match the ordering')
+        model = self.queryset.model
+        parsed = []
+        for field, value in zip(self._fields, values):
+            try:
+                model_field = model._meta.get_field(field)
+            except FieldDoesNotExist:
+                parsed.append(value)
+                continue
+            parsed.append(model_field.to_python(value))
+        return parsed
+
+    def _after(self, values, backwards):
+        """Q matching rows strictly after `values` in the (possibly reversed) ordering."""
+        condition = Q()
+        for i, name in enumerate(self.ordering):
+            descending = name.startswith('-') != backwards
+            field = self._fields[i]
+            step = Q(**{f'{field}__{"lt" if descending else "gt"}': values[i]})
+            for prior in range(i):
+                step &= Q(**{self._fields[prior]: values[prior]})
+            condition |= step
+        return condition
+
+    def _approximate_count(self):
+        n = self.queryset.order_by().values('pk')[:APPROXIMATE_COUNT_CAP + 1].count()
+        return min(n, APPROXIMATE_COUNT_CAP), n <= APPROXIMATE_COUNT_CAP
+
+    def page(self, cursor=None):
+        """Return the page after/before `cursor` (the first page when None or invalid)."""
+        direction, values = 'next', None
+        if cursor:
+            try:
+                direction, values = decode_cursor(cursor)
+                values = self._parse_values(values)
+            except (InvalidCursor, ValidationError):
+                direction, values = 'next', None
+
+        backwards = direction == 'prev'
+        ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering] \
+            if backwards else list(self.ordering)
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = encode_cursor('next', self._key(rows[-1]))
+            if (has_more and backwards) or (values is not None and not backwards):
+                previous_cursor = encode_cursor('prev', self._key(rows[0]))
+
+        total = self._approximate_count() if self.count else None
+        return CursorPage(rows, next_cursor, previous_cursor, total)
+
+
+def paginate_sorted(items, key, per_page, cursor=None, include=None, total=None):
+    """
+    Keyset-paginate an in-memory sequence sorted by `key(item)`, a tuple
+    that must be unique (end it with the id).
+
+    The cursor holds the boundary item's key and the page resumes where
+    bisection puts it, so any depth costs O(log n) plus the page, and items
+    added or removed between requests shift nothing. With `include`, items
+    it rejects are skipped while scanning from there.
+    """
+    direction, after = 'next', None
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor)
+            after = tuple(values)
+        except InvalidCursor:
+            pass
+    backwards = direction == 'prev' and after is not None
+    start = 0
+    if after is not None:
+        try:
+            start = (bisect.bisect_left if backwards else bisect.bisect_right)(items, after, key=key)
+        except TypeError:
+            # A key of another sort order
+            after, backwards = None, False
+
+    rows = []
+    for position in range(start - 1, -1, -1) if backwards else range(start, len(items)):
+        item = items[position]
+        if include is None or include(item):
+            rows.append(item)
+            if len(rows) > per_page:
+                break
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = encode_cursor('next', list(key(rows[-1])))
+        if (has_more and backwards) or (after is not None and not backwards):
+            previous_cursor = encode_cursor('prev', list(key(rows[0])))
+    return CursorPage(rows, next_cursor, previous_cursor, total)
+
+
+def paginate_list(items, per_page, cursor=None):
+    """
+    Cursor-paginate an in-memory sequence with no sort key to resume from
+    (e.g. ids ranked by search relevance, a short list); the cursor is
+    simply the position.
+    """
+    start = 0
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor)
+            start = max(0, int(values[0]))
+        except (InvalidCursor, IndexError, TypeError, ValueError):
+            start = 0
+    end = start + per_page
+    next_cursor = encode_cursor('next', [end]) if end < len(items) else None
+    previous_cursor = encode_cursor('next', [max(0, start - per_page)]) if start > 0 else None
+    return CursorPage(list(items[start:end]), next_cursor, previous_cursor, (len(items), True))
@@ -42,12 +42,15 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # my apps
     'movies',
     'users',
     'reviews',
     'lists',
     'genres',
+    'feed',
+    'jobs',
     # django-allauth (social login)
     'django.contrib.sites',
     'allauth',
@@ -57,6 +60,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the timings cover every other middleware too
+    'filmmate.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -175,4 +180,79 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 DEFAULT_POSTER_URL="/static/images/default-image.jpg"
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
-TMDB_IMAGE_BASE = 'https://image.tmdb.org/t/p/w500' 
\ No newline at end of file
+TMDB_IMAGE_BASE = 'https://image.tmdb.org/t/p/w500'
+
+# Embedding cache (movies/vector/embedding_cache.py): in-process LRU size and
+# the row bound / location of the shared on-disk SQLite tier.
+EMBEDDING_CACHE_MEMORY_SIZE = 2048
+EMBEDDING_CACHE_MAX_ROWS = 50000
+EMBEDDING_CACHE_PATH = os.path.join(BASE_DIR, "embedding_cache.sqlite3")
+
+# ingest_chroma embedding pipeline: concurrent requests and API requests/second
+EMBEDDING_WORKERS = 4
+EMBEDDING_RATE_LIMIT = 5.0
+
+# Blue-green vector collections: how long workers cache the alias, and how long
+# a replaced collection is kept before ingest_chroma deletes it
+VECTOR_ALIAS_CACHE_SECONDS = 30
+VECTOR_RETIRED_GRACE_SECONDS = 3600
+
+# Semantic answer cache for the chatbot (movies/vector/semantic_cache.py):
+# minimum cosine similarity for a hit, entry lifetime in seconds, size bound
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_TTL = 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+
+# Vector store used by the chatbot and similar-movie queries: "chroma", or
+# "numpy" for the memory-mapped index ingest_chroma exports to VECTOR_NUMPY_DIR
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_NUMPY_DIR = os.path.join(BASE_DIR, "vector_index")
+
+# Homepage rankings (movies/rankings.py): weight of the site-wide average in the
+# Bayesian rating, half-life of trending activity and how far back it is read
+RANKING_PRIOR_WEIGHT = 10
+RANKING_TRENDING_HALF_LIFE_HOURS = 72
+RANKING_TRENDING_WINDOW_DAYS = 30
+
+# Friend activity feed (feed/services.py): recent events copied into a user's
+# feed when a friendship is accepted
+FEED_BACKFILL_EVENTS = 50
+
+# Collaborative filtering (movies/collaborative.py): latest movies per user read
+# when building neighbours, and when recommending to one user
+RECOMMEND_MAX_HISTORY = 500
+RECOMMEND_RECENT_HISTORY = 50
+
+# Background jobs (jobs/queue.py): rating counters, popularity, trending, taste
+# vectors and feed fan-out are updated by `manage.py run_worker`, which must run
+# next to the web server in production. JOBS_IMMEDIATE runs them in-process
+# after commit instead (the default with DEBUG, so runserver alone is enough).
+# Then: retry backoff base, when a running job is checked for a dead worker,
+# and how long finished jobs are kept
+JOBS_IMMEDIATE = os.getenv("JOBS_IMMEDIATE", str(DEBUG)) == "True"
+JOBS_RETRY_DELAY_SECONDS = 10
+JOBS_LOCK_TIMEOUT_SECONDS = 600
+JOBS_KEEP_DONE_HOURS = 24
+
+# Request metrics (filmmate/metrics.py), served at /metrics/ in the Prometheus
+# text format to a bearer METRICS_TOKEN or a staff session; quantiles cover
+# the latest METRICS_WINDOW requests per view
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False") == "True"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+METRICS_WINDOW = 1024
+
+# Application logs as one JSON object per line on stderr (filmmate/log.py)
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {"()": "filmmate.log.JsonFormatter"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "json"},
+    },
+    "loggers": {
+        app: {"handlers": ["console"], "level": os.getenv("LOG_LEVEL", "INFO"), "propagate": False}
+        for app in ("filmmate", "movies", "users", "reviews", "lists", "feed", "jobs")
+    },
+}
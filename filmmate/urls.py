@@ -19,6 +19,8 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf.urls.static import static
 
+from filmmate.metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -27,6 +29,7 @@ urlpatterns = [
     path('lists/', include('lists.urls')),
     path('users/', include('users.urls')),
     path('accounts/', include('allauth.urls')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'jobs'
+
+    def ready(self):
+        # Register every app's tasks so the worker can run them by name
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('tasks')
+
+        from filmmate.metrics import register_collector
+        from .queue import queue_metrics
+        register_collector(queue_metrics)
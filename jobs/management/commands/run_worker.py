@@ -0,0 +1,101 @@
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.queue import WORKER_ID, claim, purge_finished, registry, requeue_stale, run_job
+
+logger = logging.getLogger(__name__)
+
+# Done jobs are kept this long (for inspection and metrics), then purged
+KEEP_DONE = timedelta(hours=getattr(settings, "JOBS_KEEP_DONE_HOURS", 24))
+# Seconds between housekeeping passes (stale locks, purging)
+HOUSEKEEPING_SECONDS = 60
+
+
+def _run_in_thread(job):
+    close_old_connections()
+    try:
+        return run_job(job)
+    except Exception:
+        # Recording a failure failed (DB gone?); the task's work was rolled back,
+        # so requeue_stale can safely hand the job out again
+        logger.exception("Job outcome could not be recorded", extra={"job": job.pk, "task": job.task})
+        return False
+    finally:
+        # Each pool thread has its own connection; do not leak it
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see jobs.queue) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help='Jobs run at once in a thread pool (default: 4); start more '
+                                 'workers for more processes')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty (default: 1)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit as soon as no job is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        poll_interval = options['poll_interval']
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Stopping after the running jobs finish...')
+            stopping.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f'Worker {WORKER_ID}: {len(registry)} tasks, concurrency {concurrency}')
+        done = failed = 0
+        housekeeping_at = 0.0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='job') as pool:
+            while not stopping.is_set():
+                now = time.monotonic()
+                if now - housekeeping_at >= HOUSEKEEPING_SECONDS:
+                    housekeeping_at = now
+                    try:
+                        requeued = requeue_stale()
+                        purged = purge_finished(KEEP_DONE)
+                    except Exception:
+                        # Not worth dying for; jobs can still be claimed and run
+                        logger.exception('Job housekeeping failed')
+                    else:
+                        if requeued or purged:
+                            self.stdout.write(f'Requeued {requeued} stale jobs, purged {purged} finished ones.')
+
+                free = concurrency - len(pending)
+                jobs = claim(free) if free else []
+                pending.update(pool.submit(_run_in_thread, job) for job in jobs)
+                if not pending:
+                    if options['once']:
+                        break
+                    stopping.wait(poll_interval)
+                    continue
+
+                finished, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    if future.result():
+                        done += 1
+                    else:
+                        failed += 1
+
+            for future in wait(pending).done:
+                if future.result():
+                    done += 1
+                else:
+                    failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped: {done} jobs done, {failed} failed.'))
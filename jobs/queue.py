@@ -0,0 +1,219 @@
+"""
+A small job queue stored in the database; no broker needed.
+
+Mark a function with `@task` and call `fn.enqueue(...)` instead of running
+it inline. The Job row is inserted in the caller's transaction, so the
+worker (`manage.py run_worker`) only sees it once the write that caused it
+has committed, and a rolled-back write takes its jobs with it.
+
+Every job runs in its own transaction, which also marks it done, so its
+work is committed exactly once. A failed attempt is rolled back and
+retried with exponential backoff, up to the task's max_attempts. With
+JOBS_IMMEDIATE the task runs in-process right after commit instead, which
+is handy when no worker is running.
+
+Jobs are not run in enqueue order: a worker runs several at once, and a
+retry runs after jobs queued behind it. Tasks must therefore give the same
+result in any order, either by applying deltas that commute (signed F()
+updates, as movies.ratings does) or by recomputing from the source rows
+(as the taste and feed jobs do).
+"""
+import json
+import logging
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from filmmate import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+IMMEDIATE = getattr(settings, "JOBS_IMMEDIATE", False)
+# Base delay before a retry; doubles with every further attempt
+RETRY_DELAY = timedelta(seconds=getattr(settings, "JOBS_RETRY_DELAY_SECONDS", 10))
+# Running jobs older than this are checked for a dead worker (see requeue_stale)
+LOCK_TIMEOUT = timedelta(seconds=getattr(settings, "JOBS_LOCK_TIMEOUT_SECONDS", 600))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<Task {self.name}>"
+
+    def enqueue(self, *args, dedup_key=None, delay=None, **kwargs):
+        """
+        Queue a call; returns the Job, or None when a queued job with the
+        same `dedup_key` already exists (or the task runs immediately).
+        """
+        if IMMEDIATE:
+            transaction.on_commit(lambda: _run_inline(self, args, kwargs))
+            return None
+        job = Job(
+            task=self.name, args=list(args), kwargs=kwargs, dedup_key=dedup_key,
+            max_attempts=self.max_attempts, run_at=timezone.now() + (delay or timedelta()),
+        )
+        if dedup_key is None:
+            job.save()
+            return job
+        try:
+            with transaction.atomic():
+                job.save()
+        except IntegrityError:
+            return None
+        return job
+
+
+def task(name=None, max_attempts=3):
+    """Register a function as a task: `@task()` then `func.enqueue(*args)`."""
+    def decorator(func):
+        registered = Task(func, name or f"{func.__module__}.{func.__name__}", max_attempts)
+        registry[registered.name] = registered
+        return registered
+    return decorator
+
+
+def _run_inline(registered, args, kwargs):
+    # Same arguments the worker would see after the round trip through the Job row
+    args, kwargs = json.loads(json.dumps([args, kwargs], cls=DjangoJSONEncoder))
+    try:
+        with transaction.atomic():
+            registered.func(*args, **kwargs)
+    except Exception:
+        logger.exception("Task failed", extra={"task": registered.name})
+
+
+def requeue_stale():
+    """
+    Give jobs of crashed workers back to the queue; returns how many.
+
+    A running job keeps its row locked until it commits (see `run_job`), so
+    rows that are still locked belong to a live worker and are skipped; a
+    dead worker's lock went away with its connection, and its work was
+    rolled back with it. A stale job whose dedup key is queued again is
+    dropped instead: the queued one does the same work.
+    """
+    with transaction.atomic():
+        stale = list(
+            Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - LOCK_TIMEOUT)
+            .select_for_update(skip_locked=True).order_by("id").values_list("id", "dedup_key")
+        )
+        if not stale:
+            return 0
+        taken = set(
+            Job.objects.filter(status=Job.QUEUED, dedup_key__in=[key for _, key in stale if key])
+            .values_list("dedup_key", flat=True)
+        )
+        requeue, superseded = [], []
+        for job_id, key in stale:
+            if key is None:
+                requeue.append(job_id)
+            elif key in taken:
+                superseded.append(job_id)
+            else:
+                taken.add(key)
+                requeue.append(job_id)
+        Job.objects.filter(id__in=superseded).delete()
+        return Job.objects.filter(id__in=requeue).update(status=Job.QUEUED, locked_at=None, locked_by="")
+
+
+def claim(limit, worker_id=WORKER_ID):
+    """Mark up to `limit` due jobs as running by this worker and return them."""
+    with transaction.atomic():
+        due = Job.objects.filter(status=Job.QUEUED, run_at__lte=timezone.now()).order_by("run_at", "id")
+        # Several workers can poll at once: skip rows another one is claiming
+        ids = list(due.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING, locked_at=timezone.now(), locked_by=worker_id, attempts=F("attempts") + 1
+        )
+    return list(Job.objects.filter(id__in=ids).order_by("run_at", "id"))
+
+
+def run_job(job):
+    """Run one claimed job and record the outcome; returns True on success."""
+    registered = registry.get(job.task)
+    started = time.perf_counter()
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task {job.task!r}")
+        with transaction.atomic():
+            # Locked until commit, so requeue_stale leaves a long-running job alone
+            if not Job.objects.select_for_update().filter(pk=job.pk, status=Job.RUNNING).exists():
+                return False
+            registered.func(*job.args, **job.kwargs)
+            # Marked done in the task's own transaction: the work is never committed twice
+            job.status = Job.DONE
+            job.finished = timezone.now()
+            job.save(update_fields=["status", "finished"])
+    except Exception:
+        metrics.observe("job_seconds", time.perf_counter() - started, task=job.task)
+        metrics.increment("jobs_total", task=job.task, outcome="error")
+        logger.warning("Job failed", extra={"job": job.pk, "task": job.task, "attempt": job.attempts},
+                       exc_info=True)
+        job.last_error = traceback.format_exc()
+        job.locked_at = None
+        job.locked_by = ""
+        if registered is not None and job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        else:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+        try:
+            with transaction.atomic():
+                job.save(update_fields=["status", "run_at", "locked_at", "locked_by", "last_error", "finished"])
+        except IntegrityError:
+            # A newer job with the same dedup key is queued and will do the work
+            job.delete()
+        return False
+
+    metrics.observe("job_seconds", time.perf_counter() - started, task=job.task)
+    metrics.increment("jobs_total", task=job.task, outcome="done")
+    return True
+
+
+def purge_finished(older_than):
+    """Delete done jobs finished before `older_than` ago; failed ones are kept for inspection."""
+    return Job.objects.filter(status=Job.DONE, finished__lt=timezone.now() - older_than).delete()[0]
+
+
+def queue_stats():
+    """Jobs per status, and how many seconds the oldest due job has been waiting."""
+    now = timezone.now()
+    counts = dict(Job.objects.values("status").annotate(n=Count("id")).values_list("status", "n"))
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(oldest=Min("run_at"))["oldest"]
+    return {
+        "counts": {status: counts.get(status, 0) for status in (Job.QUEUED, Job.RUNNING, Job.DONE, Job.FAILED)},
+        "lag_seconds": (now - oldest).total_seconds() if oldest else 0.0,
+    }
+
+
+def queue_metrics():
+    """metrics collector (registered by JobsConfig)."""
+    stats = queue_stats()
+    return [
+        ("jobs", "gauge", "Background jobs per status",
+         [({"status": status}, n) for status, n in stats["counts"].items()]),
+        ("jobs_lag_seconds", "gauge", "Age of the oldest due queued job", [({}, stats["lag_seconds"])]),
+    ]
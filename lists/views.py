@@ -3,6 +3,8 @@ from django.contrib.auth.decorators import login_required
 from users.models import CustomUser  # ✅ Import this for user lookups
 from .models import List
 from movies.models import Movie
+from movies.catalog import get_catalog
+from filmmate.pagination import CursorPaginator
 
 @login_required
 def list_overview(request):
@@ -13,7 +15,7 @@ def list_overview(request):
 @login_required
 def list_create(request):
     """Create a new list and optionally add movies."""
-    movies = Movie.objects.all()
+    movies = get_catalog().sorted('title')
     error_message = None
 
     if request.method == 'POST':
@@ -44,13 +46,15 @@ def list_create(request):
 def list_detail(request, pk):
     """Show details of a specific list."""
     user_list = get_object_or_404(List, pk=pk, user=request.user)
-    return render(request, 'lists/list_detail.html', {'list': user_list})
+    paginator = CursorPaginator(user_list.movies.all(), 24, ('title', 'id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
+    return render(request, 'lists/list_detail.html', {'list': user_list, 'page_obj': page_obj})
 
 @login_required
 def list_edit(request, pk):
     """Edit an existing list (name, description, movies)."""
     user_list = get_object_or_404(List, pk=pk, user=request.user)
-    movies = Movie.objects.all()
+    movies = get_catalog().sorted('title')
     error_message = None
 
     if request.method == 'POST':
@@ -73,6 +77,7 @@ def list_edit(request, pk):
     return render(request, 'lists/list_edit.html', {
         'list': user_list,
         'movies': movies,
+        'selected_ids': set(user_list.movies.values_list('id', flat=True)),
         'error_message': error_message,
     })
 
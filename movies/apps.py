@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        from filmmate.metrics import register_collector
+        from .metrics import cache_metrics
+        register_collector(cache_metrics)
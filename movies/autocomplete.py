@@ -0,0 +1,12 @@
+from filmmate.autocomplete import AutocompleteSource
+from movies.catalog import catalog_stamp
+from movies.models import Movie
+
+
+def _title_entries(movies):
+    for movie_id, title, year in movies.values_list('id', 'title', 'year'):
+        yield title, {'id': movie_id, 'title': title, 'year': year}
+
+
+# Titles and years are catalog snapshot fields, so CatalogVersion moves with them
+titles = AutocompleteSource(Movie, _title_entries, fields=['title', 'year'], stamp=catalog_stamp)
@@ -0,0 +1,233 @@
+"""
+Worker-local snapshot of the catalog for read-only listings.
+
+The catalog page and the list editor show many movies but only a few
+columns each, so every worker keeps one compact CatalogEntry per movie
+(id, title, year, director, poster and a genre bitmask) together with the
+facet bitmaps built from the same load. Sort orders are computed once per
+snapshot and filtering is bit arithmetic, so these pages run no catalog
+queries.
+
+The snapshot is rebuilt when CatalogVersion (bumped by the movie and genre
+signals) or the movie/link counts change, checked at most every
+CATALOG_CHECK_SECONDS; a change made in this worker forces the check on
+the next request.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+
+from filmmate.pagination import paginate_sorted
+from genres.models import Genre
+from movies.facets import FacetIndex
+from movies.models import CatalogVersion, Movie
+
+CATALOG_CHECK_SECONDS = getattr(settings, "CATALOG_CHECK_SECONDS", 60)
+
+# Movie fields held by the snapshot or indexed by movies.search; saves that
+# touch none of them keep both
+SNAPSHOT_FIELDS = {"title", "year", "director", "poster", "description"}
+
+MovieGenre = Movie.genres.through
+
+SORT_KEYS = {
+    "title": lambda entry: (entry.title.casefold(), entry.id),
+    "year": lambda entry: (entry.year, entry.id),
+    "director": lambda entry: (entry.director.casefold(), entry.id),
+}
+
+
+class CatalogEntry:
+    """The columns a listing needs; templates use it like a Movie."""
+    __slots__ = ("id", "title", "year", "director", "poster", "genre_mask")
+
+    def __init__(self, id, title, year, director, poster, genre_mask=0):
+        self.id = id
+        self.title = title
+        self.year = year
+        self.director = director
+        self.poster = poster
+        self.genre_mask = genre_mask
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __repr__(self):
+        return f"<CatalogEntry {self.id}: {self.title} ({self.year})>"
+
+
+class Catalog:
+    def __init__(self, movies, links, genres):
+        # movies: [(id, title, year, director, poster)] ordered by id,
+        # links: [(movie_id, genre_id)], genres: [(id, name)]
+        links = list(links)
+        self.entries = [CatalogEntry(*row) for row in movies]
+        # Entry i is bit i of every facet bitmap
+        self.facets = FacetIndex([(entry.id, entry.year) for entry in self.entries], links, genres)
+        self.position = self.facets.position
+
+        self.genre_bit = {key: 1 << j for j, key in enumerate(sorted(self.facets.genre_ids))}
+        key_of = {genre_id: key for key, ids in self.facets.genre_ids.items() for genre_id in ids}
+        for movie_id, genre_id in links:
+            i = self.position.get(movie_id)
+            key = key_of.get(genre_id)
+            if i is not None and key is not None:
+                self.entries[i].genre_mask |= self.genre_bit[key]
+
+        self._orders = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, movie_id):
+        i = self.position.get(movie_id)
+        return self.entries[i] if i is not None else None
+
+    def genres_of(self, movie_id):
+        """Display names of a movie's genres (duplicate genre rows merged)."""
+        entry = self.get(movie_id)
+        if entry is None:
+            return []
+        return [self.facets.genre_names[key] for key, bit in self.genre_bit.items() if entry.genre_mask & bit]
+
+    def in_order(self, movie_ids):
+        """Entries for `movie_ids` in that order, skipping unknown ids."""
+        return [self.entries[self.position[movie_id]] for movie_id in movie_ids if movie_id in self.position]
+
+    def _order(self, sort):
+        order = self._orders.get(sort)
+        if order is None:
+            with self._lock:
+                key = SORT_KEYS[sort]
+                order = sorted(range(len(self.entries)), key=lambda i: key(self.entries[i]))
+                self._orders[sort] = order
+        return order
+
+    def sorted(self, sort="title"):
+        """Every entry ordered by `sort` ("title", "year" or "director"), then id."""
+        return [self.entries[i] for i in self._order(sort)]
+
+    def select(self, bits, sort="title"):
+        """Entries whose facet bit is set in `bits`, ordered by `sort` (a lazy Selection)."""
+        return Selection(self, bits, sort)
+
+    def filter(self, entries, genres=(), match_all=False, year_min=None, year_max=None):
+        """Keep the entries matching the facet filters, preserving their order."""
+        mask = 0
+        for key in genres:
+            mask |= self.genre_bit.get(key, 0)
+        return [
+            entry for entry in entries
+            if (not genres or (entry.genre_mask & mask == mask if match_all else entry.genre_mask & mask))
+            and (year_min is None or entry.year >= year_min)
+            and (year_max is None or entry.year <= year_max)
+        ]
+
+
+class _Ordered:
+    """The catalog entries in one sort order, as a sequence (nothing is copied)."""
+
+    def __init__(self, entries, order):
+        self.entries = entries
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, position):
+        return self.entries[self.order[position]]
+
+
+class Selection:
+    """
+    A filtered, sorted view of the catalog that only builds the entries a
+    page shows. The length is a popcount; `page` resumes after the previous
+    page's last (sort key, id) by bisecting into the cached sort order, so
+    a listing page costs the same at any depth.
+    """
+
+    def __init__(self, catalog, bits, sort):
+        self.catalog = catalog
+        self.bits = bits
+        self.sort = sort
+        self.everything = bits == catalog.facets.all_bits
+
+    def __len__(self):
+        return len(self.catalog) if self.everything else self.bits.bit_count()
+
+    def _ordered(self):
+        return _Ordered(self.catalog.entries, self.catalog._order(self.sort))
+
+    def _includes(self):
+        """Whether an entry is selected; None when every entry is."""
+        if self.everything:
+            return None
+        position = self.catalog.position
+        # One byte lookup per candidate; shifting the int itself would copy it
+        mask = self.bits.to_bytes((len(self.catalog) + 7) // 8, "little")
+        return lambda entry: mask[position[entry.id] >> 3] >> (position[entry.id] & 7) & 1
+
+    def page(self, per_page, cursor=None):
+        """One page of entries and the cursors around it (a CursorPage)."""
+        return paginate_sorted(self._ordered(), SORT_KEYS[self.sort], per_page, cursor,
+                               include=self._includes(), total=(len(self), True))
+
+    def __iter__(self):
+        includes = self._includes()
+        ordered = self._ordered()
+        return (entry for entry in map(ordered.__getitem__, range(len(ordered)))
+                if includes is None or includes(entry))
+
+
+_lock = threading.Lock()
+_catalog = None
+_stamp = None
+_checked_at = 0.0
+
+
+def catalog_stamp():
+    """Changes whenever a movie, genre or genre link does (also used by movies.search)."""
+    version = CatalogVersion.objects.values_list("version", flat=True).first()
+    movies = Movie.objects.aggregate(n=Count("id"), last=Max("id"))
+    links = MovieGenre.objects.aggregate(n=Count("id"), last=Max("id"))
+    return (version, movies["n"], movies["last"], links["n"], links["last"])
+
+
+def get_catalog():
+    """Return this worker's Catalog, rebuilding it when the catalog changed."""
+    global _catalog, _stamp, _checked_at
+    now = time.monotonic()
+    if _catalog is not None and now - _checked_at < CATALOG_CHECK_SECONDS:
+        return _catalog
+    with _lock:
+        if _catalog is not None and now - _checked_at < CATALOG_CHECK_SECONDS:
+            return _catalog
+        stamp = catalog_stamp()
+        if _catalog is None or stamp != _stamp:
+            _catalog = Catalog(
+                Movie.objects.order_by("id").values_list("id", "title", "year", "director", "poster"),
+                MovieGenre.objects.values_list("movie_id", "genre_id"),
+                list(Genre.objects.values_list("id", "name")),
+            )
+            _stamp = stamp
+        _checked_at = now
+    return _catalog
+
+
+def bump_version(sender=None, update_fields=None, action=None, **kwargs):
+    """
+    Record a catalog change; usable directly as a post_save/post_delete/
+    m2m_changed receiver. Movie saves touching no snapshot field are ignored.
+    """
+    global _checked_at
+    if sender is Movie and update_fields and not SNAPSHOT_FIELDS.intersection(update_fields):
+        return
+    if action is not None and not action.startswith("post_"):
+        return
+    if not CatalogVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    _checked_at = 0.0
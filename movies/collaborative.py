@@ -0,0 +1,242 @@
+"""
+Item-item collaborative filtering from watch and review history.
+
+`build_item_neighbours` (run it via the build_cowatched_movies command)
+turns WatchedMovie and Review rows into a sparse user x movie matrix and
+stores each movie's top-K cosine neighbours in CoWatchedMovie. Serving
+reads that table only: "people who watched this also watched" is one
+indexed query, and a user's recommendations sum the neighbour lists of
+their recent movies (two more).
+
+The matrix is kept in CSR form as plain NumPy arrays. Similarities are
+computed a block of movies at a time, and the user-row products feeding a
+block are expanded at most CELL_BUDGET at a time, so memory is bounded by
+block size x catalog size plus that budget rather than catalog size
+squared. Each user contributes at most RECOMMEND_MAX_HISTORY of their
+latest movies.
+"""
+import heapq
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from movies.models import CoWatchedMovie, Movie, WatchedMovie
+from reviews.models import Review
+
+MAX_HISTORY = getattr(settings, "RECOMMEND_MAX_HISTORY", 500)
+# Movies of a user's history used when recommending to them
+RECENT_HISTORY = getattr(settings, "RECOMMEND_RECENT_HISTORY", 50)
+# Products w(u, k) * w(u, j) expanded at once while computing a block
+CELL_BUDGET = 4_000_000
+
+
+def interaction_weight(rating=None):
+    """A plain watch counts 1; a review scales it by rating / 5 (10/10 counts 2)."""
+    return 1.0 if rating is None else rating / 5
+
+
+def load_histories(max_history=MAX_HISTORY, user_ids=None):
+    """
+    {user_id: [(movie_id, weight)]}, newest first and at most `max_history`
+    movies per user (all of them when None). A review overrides the plain
+    watch of the same movie.
+    """
+    watched = WatchedMovie.objects.all()
+    reviews = Review.objects.all()
+    if user_ids is not None:
+        watched = watched.filter(user_id__in=user_ids)
+        reviews = reviews.filter(user_id__in=user_ids)
+
+    events = {}
+    for user_id, movie_id, when in watched.values_list("user_id", "movie_id", "watched_at").iterator(chunk_size=5000):
+        events[user_id, movie_id] = (when, None)
+    # Oldest first, so the latest review of a movie wins
+    for user_id, movie_id, when, rating in (
+        reviews.order_by("date").values_list("user_id", "movie_id", "date", "rating").iterator(chunk_size=5000)
+    ):
+        seen = events.get((user_id, movie_id))
+        events[user_id, movie_id] = (max(when, seen[0]) if seen else when, rating)
+
+    histories = {}
+    for (user_id, movie_id), (when, rating) in events.items():
+        histories.setdefault(user_id, []).append((when, movie_id, interaction_weight(rating)))
+    return {
+        user_id: [
+            (movie_id, weight) for _, movie_id, weight in
+            (sorted(rows, reverse=True) if max_history is None else heapq.nlargest(max_history, rows))
+        ]
+        for user_id, rows in histories.items()
+    }
+
+
+def _ranges(starts, lengths):
+    """Concatenation of range(start, start + length) for each pair, vectorized."""
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + (np.arange(total) - offsets)
+
+
+class InteractionMatrix:
+    """Sparse user x movie weights in CSR form, plus its transpose (CSC)."""
+
+    def __init__(self, histories, movie_ids):
+        self.movie_ids = np.asarray(sorted(movie_ids), dtype=np.int64)
+        position = {movie_id: i for i, movie_id in enumerate(self.movie_ids.tolist())}
+
+        indptr, indices, data = [0], [], []
+        for rows in histories.values():
+            for movie_id, weight in rows:
+                i = position.get(movie_id)
+                if i is not None:
+                    indices.append(i)
+                    data.append(weight)
+            indptr.append(len(indices))
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.data = np.asarray(data, dtype=np.float64)
+        self.n_movies = len(self.movie_ids)
+
+        # Column view: for each movie, the users (rows) that have it
+        users = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind="stable")
+        self.col_users = users[order]
+        self.col_data = self.data[order]
+        self.col_ptr = np.concatenate(([0], np.cumsum(np.bincount(self.indices, minlength=self.n_movies))))
+
+        self.norms = np.sqrt(np.bincount(self.indices, weights=self.data ** 2, minlength=self.n_movies))
+
+    def similarities(self, positions):
+        """Dense cosine similarities of the movies at `positions` against every movie."""
+        positions = np.asarray(positions, dtype=np.int64)
+        # Entries (movie k of the block, user u, weight) of the block's columns
+        col_lengths = self.col_ptr[positions + 1] - self.col_ptr[positions]
+        entries = _ranges(self.col_ptr[positions], col_lengths)
+        rows = np.repeat(np.arange(len(positions)), col_lengths)
+        users = self.col_users[entries]
+        weights = self.col_data[entries]
+
+        # Expand each entry by the user's whole row: products w(u, k) * w(u, j).
+        # Popular movies have large audiences, so entries are taken a chunk of
+        # at most CELL_BUDGET products at a time (and at least one entry).
+        row_lengths = self.indptr[users + 1] - self.indptr[users]
+        ends = np.cumsum(row_lengths)
+        size = len(positions) * self.n_movies
+        block = np.zeros(size)
+        start = 0
+        while start < len(users):
+            done = int(ends[start - 1]) if start else 0
+            stop = max(start + 1, int(np.searchsorted(ends, done + CELL_BUDGET, side="right")))
+            lengths = row_lengths[start:stop]
+            cells = _ranges(self.indptr[users[start:stop]], lengths)
+            block += np.bincount(
+                np.repeat(rows[start:stop], lengths) * self.n_movies + self.indices[cells],
+                weights=np.repeat(weights[start:stop], lengths) * self.data[cells],
+                minlength=size,
+            )
+            start = stop
+        block = block.reshape(len(positions), self.n_movies)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            block /= np.outer(self.norms[positions], self.norms)
+        block[~np.isfinite(block)] = 0.0
+        block[np.arange(len(positions)), positions] = 0.0
+        return block
+
+
+def top_neighbours(matrix, positions, top_k, block_size=256):
+    """Yield (movie_id, similar_id, rank, score) for the movies at `positions`."""
+    for start in range(0, len(positions), block_size):
+        batch = positions[start:start + block_size]
+        block = matrix.similarities(batch)
+        k = min(top_k, matrix.n_movies - 1)
+        if k <= 0:
+            return
+        best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        for row, position in enumerate(batch):
+            scores = block[row, best[row]]
+            order = np.argsort(-scores, kind="stable")
+            rank = 0
+            for j in best[row][order]:
+                score = float(block[row, j])
+                if score <= 0:
+                    break
+                yield int(matrix.movie_ids[position]), int(matrix.movie_ids[j]), rank, score
+                rank += 1
+
+
+def changed_movie_ids(since):
+    """Movies whose neighbour lists may have moved: everything seen by users active since `since`."""
+    users = set(WatchedMovie.objects.filter(watched_at__gt=since).values_list("user_id", flat=True))
+    users.update(Review.objects.filter(date__gt=since).values_list("user_id", flat=True))
+    movie_ids = set()
+    for rows in load_histories(user_ids=users).values():
+        movie_ids.update(movie_id for movie_id, _ in rows)
+    return movie_ids
+
+
+def last_build():
+    """Start of the latest build; activity after it is what --incremental picks up."""
+    return CoWatchedMovie.objects.aggregate(last=Max("computed_at"))["last"]
+
+
+def build_item_neighbours(top_k=20, block_size=256, max_history=MAX_HISTORY, movie_ids=None):
+    """
+    Recompute CoWatchedMovie for `movie_ids` (every movie when None);
+    returns (movies processed, rows written).
+    """
+    # Stamped before reading: activity written during the build is newer than
+    # the watermark, so the next incremental run still picks it up
+    started = timezone.now()
+    matrix = InteractionMatrix(load_histories(max_history), Movie.objects.values_list("id", flat=True))
+    if movie_ids is None:
+        positions = np.arange(matrix.n_movies)
+    else:
+        positions = np.flatnonzero(np.isin(matrix.movie_ids, list(movie_ids)))
+
+    rows = [
+        CoWatchedMovie(movie_id=movie_id, similar_id=similar_id, rank=rank, score=score, computed_at=started)
+        for movie_id, similar_id, rank, score in top_neighbours(matrix, positions, top_k, block_size)
+    ]
+    # Swap the affected rows in one transaction so readers never see them half-built
+    with transaction.atomic():
+        stale = CoWatchedMovie.objects.all()
+        if movie_ids is not None:
+            stale = stale.filter(movie_id__in=matrix.movie_ids[positions].tolist())
+        stale.delete()
+        CoWatchedMovie.objects.bulk_create(rows, batch_size=1000)
+    return len(positions), len(rows)
+
+
+def also_watched(movie, limit=8):
+    """People who watched `movie` also watched these (Movie objects, best first)."""
+    entries = (
+        CoWatchedMovie.objects.filter(movie=movie)
+        .select_related("similar")
+        .order_by("rank")[:limit]
+    )
+    return [entry.similar for entry in entries]
+
+
+def recommend_for_user(user, limit=10, recent=RECENT_HISTORY):
+    """
+    Movie ids for `user`, best first: the neighbours of their `recent`
+    latest movies, each weighted by how much they liked that movie.
+    """
+    history = load_histories(max_history=recent, user_ids=[user.pk]).get(user.pk, [])
+    if not history:
+        return []
+    weights = dict(history)
+    seen = set(WatchedMovie.objects.filter(user=user).values_list("movie_id", flat=True)) | set(weights)
+
+    scores = {}
+    for movie_id, similar_id, score in (
+        CoWatchedMovie.objects.filter(movie_id__in=weights).values_list("movie_id", "similar_id", "score")
+    ):
+        if similar_id not in seen:
+            scores[similar_id] = scores.get(similar_id, 0.0) + weights[movie_id] * score
+    return heapq.nlargest(limit, scores, key=scores.get)
@@ -0,0 +1,111 @@
+"""
+Genre and decade facets for the catalog page.
+
+Each worker keeps one bitmap (a Python int, bit i = i-th movie) per genre,
+per year and per decade. Filtering is AND/OR of bitmaps and a facet count
+is a popcount, so counts for any filter combination need no extra query.
+The bitmaps are built with the worker's catalog snapshot (movies.catalog)
+and rebuilt with it.
+"""
+from functools import reduce
+from operator import and_, or_
+
+
+def _bitmap(positions, size):
+    """One int with the given bits set, built in a single pass over a byte buffer."""
+    buf = bytearray((size + 7) // 8)
+    for i in positions:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+class FacetIndex:
+    def __init__(self, movies, links, genres):
+        # movies: [(id, year)], links: [(movie_id, genre_id)], genres: [(id, name)]
+        # Genres are keyed by lower-cased name, so duplicate genre rows act as one
+        self.genre_ids = {}
+        for genre_id, name in genres:
+            self.genre_ids.setdefault(name.lower(), []).append(genre_id)
+        key_of = {genre_id: name.lower() for genre_id, name in genres}
+        self.genre_names = {name.lower(): name for _, name in genres}
+
+        # Positions are collected per key first: OR-ing bits into a growing int
+        # one movie at a time copies the whole int each time (quadratic)
+        self.position = {}
+        year_positions = {}
+        for i, (movie_id, year) in enumerate(movies):
+            self.position[movie_id] = i
+            year_positions.setdefault(year, []).append(i)
+        size = len(movies)
+        self.all_bits = (1 << size) - 1
+        self.year_bits = {year: _bitmap(positions, size) for year, positions in year_positions.items()}
+
+        genre_positions = {}
+        for movie_id, genre_id in links:
+            i = self.position.get(movie_id)
+            key = key_of.get(genre_id)
+            if i is not None and key is not None:
+                genre_positions.setdefault(key, []).append(i)
+        self.genre_bits = {key: _bitmap(positions, size) for key, positions in genre_positions.items()}
+
+        self.decade_bits = {}
+        for year, bits in self.year_bits.items():
+            decade = year - year % 10
+            self.decade_bits[decade] = self.decade_bits.get(decade, 0) | bits
+
+    def ids_bits(self, movie_ids):
+        positions = (self.position.get(movie_id) for movie_id in movie_ids)
+        return _bitmap([i for i in positions if i is not None], len(self.position))
+
+    def genre_keys(self, names):
+        """Known genre keys for the requested names (case-insensitive)."""
+        keys = []
+        for name in names:
+            key = name.lower()
+            if key in self.genre_ids and key not in keys:
+                keys.append(key)
+        return keys
+
+    def genre_filter_bits(self, genres, match_all):
+        if not genres:
+            return self.all_bits
+        sets = [self.genre_bits.get(key, 0) for key in genres]
+        return reduce(and_ if match_all else or_, sets)
+
+    def year_filter_bits(self, year_min, year_max):
+        if year_min is None and year_max is None:
+            return self.all_bits
+        bits = 0
+        for year, year_set in self.year_bits.items():
+            if (year_min is None or year >= year_min) and (year_max is None or year <= year_max):
+                bits |= year_set
+        return bits
+
+    def facets(self, base_bits, genres, match_all, year_min, year_max):
+        """
+        Result size plus genre and decade counts.
+
+        Counts follow the usual disjunctive-facet rule: a facet's own filter
+        is left out when counting it (for "any" genres, so each count says
+        how many results adding that genre would give; decades ignore the
+        year range), every other filter applies.
+        """
+        genre_bits = self.genre_filter_bits(genres, match_all)
+        year_bits = self.year_filter_bits(year_min, year_max)
+        result = base_bits & genre_bits & year_bits
+
+        genre_base = base_bits & year_bits if not match_all else result
+        decade_base = base_bits & genre_bits
+        return {
+            "total": result.bit_count(),
+            "genres": [
+                {"name": self.genre_names[key], "count": (genre_base & self.genre_bits.get(key, 0)).bit_count(),
+                 "selected": key in genres}
+                for key in sorted(self.genre_names)
+            ],
+            "decades": [
+                {"decade": decade, "count": (decade_base & bits).bit_count()}
+                for decade, bits in sorted(self.decade_bits.items())
+            ],
+        }
+
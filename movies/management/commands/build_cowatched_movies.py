@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.collaborative import MAX_HISTORY, build_item_neighbours, changed_movie_ids, last_build
+
+
+class Command(BaseCommand):
+    help = 'Precompute "people who watched this also watched" neighbours from watch and review history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20,
+                            help='How many neighbours to store per movie (default: 20)')
+        parser.add_argument('--block-size', type=int, default=256,
+                            help='Movies per similarity block; bounds memory to block size x catalog size')
+        parser.add_argument('--max-history', type=int, default=MAX_HISTORY,
+                            help=f'Latest movies read per user (default: {MAX_HISTORY})')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only recompute movies seen by users active since the last build')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        movie_ids = None
+        if options['incremental']:
+            since = last_build()
+            if since is None:
+                self.stdout.write('No previous build, computing every movie.')
+            else:
+                movie_ids = changed_movie_ids(since)
+                self.stdout.write(f'{len(movie_ids)} movies touched by activity since {since:%Y-%m-%d %H:%M}.')
+                if not movie_ids:
+                    return
+
+        movies, rows = build_item_neighbours(
+            top_k=options['top_k'],
+            block_size=options['block_size'],
+            max_history=options['max_history'],
+            movie_ids=movie_ids,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {rows} neighbours for {movies} movies in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from movies.models import Movie, SimilarMovie
+from movies.vector.versions import get_active_collection
+
+
+class Command(BaseCommand):
+    help = 'Precompute the top-K similar movies for every movie from the vector store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=8,
+                            help='How many neighbours to store per movie (default: 8)')
+        parser.add_argument('--batch-size', type=int, default=50,
+                            help='How many movies to query the vector store with at once')
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        batch_size = options['batch_size']
+
+        try:
+            collection = get_active_collection()
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Vector store is not available: {e}. Run ingest_chroma first."))
+            return
+
+        # 1. Use the stored embedding of each movie's first chunk (title, genres
+        # and the start of the plot), so no embedding API call is needed.
+        data = collection.get(include=['embeddings', 'metadatas'])
+        vectors = {}
+        for chunk_id, embedding, meta in zip(data['ids'], data['embeddings'], data['metadatas']):
+            if not chunk_id.endswith('_chunk_0'):
+                continue
+            vectors[int(meta['movie_id'])] = embedding
+
+        existing_ids = set(Movie.objects.values_list('id', flat=True))
+        movie_ids = [m_id for m_id in vectors if m_id in existing_ids]
+        self.stdout.write(f'Computing neighbours for {len(movie_ids)} movies...')
+
+        # 2. Query the index in batches; several chunks of one movie can match,
+        # so over-fetch and keep the first hit per movie.
+        rows = []
+        for i in range(0, len(movie_ids), batch_size):
+            batch_ids = movie_ids[i:i + batch_size]
+            results = collection.query(
+                query_embeddings=[vectors[m_id] for m_id in batch_ids],
+                n_results=top_k * 3 + 1,
+                include=['metadatas', 'distances'],
+            )
+            for m_id, metas, distances in zip(batch_ids, results['metadatas'], results['distances']):
+                seen = {m_id}
+                rank = 0
+                for meta, distance in zip(metas, distances):
+                    other_id = int(meta['movie_id'])
+                    if other_id in seen or other_id not in existing_ids:
+                        continue
+                    seen.add(other_id)
+                    rows.append(SimilarMovie(movie_id=m_id, similar_id=other_id, rank=rank, distance=distance))
+                    rank += 1
+                    if rank >= top_k:
+                        break
+
+        # 3. Swap the whole table in one transaction so readers never see it half-built
+        with transaction.atomic():
+            SimilarMovie.objects.all().delete()
+            SimilarMovie.objects.bulk_create(rows, batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(f'Stored {len(rows)} neighbours for {len(movie_ids)} movies.'))
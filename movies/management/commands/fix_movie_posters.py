@@ -59,20 +59,20 @@ class Command(BaseCommand):
                         # 3. We found a poster! Build the full URL and save it.
                         correct_url = f"{IMAGE_BASE_URL}{poster_path}"
                         movie.poster = correct_url
-                        movie.save()
+                        movie.save(update_fields=['poster'])
                         self.stdout.write(self.style.SUCCESS(f"  > SUCCESS: Updated poster for {movie.title}"))
                         fixed_count += 1
                     else:
                         # 4. Movie exists but has no poster. Save default.
                         self.stdout.write(self.style.WARNING(f"  > WARNING: No poster found on TMDB for {movie.title}."))
                         movie.poster = DEFAULT_URL
-                        movie.save()
+                        movie.save(update_fields=['poster'])
                         failed_count += 1
                 else:
                     # 5. No results found for this movie. Save default.
                     self.stdout.write(self.style.ERROR(f"  > ERROR: Could not find {movie.title} on TMDB."))
                     movie.poster = DEFAULT_URL
-                    movie.save()
+                    movie.save(update_fields=['poster'])
                     failed_count += 1
 
             except requests.RequestException as e:
@@ -1,14 +1,40 @@
+import hashlib
 import os
-import time
-import chromadb
-from django.core.management.base import BaseCommand
 from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
 from django.urls import reverse
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from movies.models import Movie
+from movies.vector.clients import get_collection, get_embeddings_model
+from movies.vector.embedding_cache import CachedEmbeddings, get_embedding_cache
+from movies.vector.embedding_pipeline import (
+    RateLimitedEmbeddings,
+    TokenBucket,
+    load_retry_file,
+    make_batches,
+    run_pipeline,
+    write_retry_file,
+)
+from movies.vector.stores import BACKEND, export_numpy_index
+from movies.vector.versions import (
+    activate,
+    bump_generation,
+    create_versioned_collection,
+    garbage_collect,
+    get_active_collection,
+    is_complete,
+    resolve_alias,
+    version_of,
+)
+
+RETRY_FILE = os.path.join(settings.BASE_DIR, "ingest_retry.jsonl")
+
+
+def content_hash(movie, genre_names):
+    """Hash of the fields that end up in the embedded text of a movie."""
+    raw = f"{movie.title}|{movie.year}|{genre_names}|{movie.description or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-# Define the directory for ChromaDB persistence
-CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", os.path.join(settings.BASE_DIR, "chroma_db"))
 
 def chunk_text(text, chunk_size=1000, overlap=100):
     """
@@ -36,35 +62,111 @@ def chunk_text(text, chunk_size=1000, overlap=100):
 class Command(BaseCommand):
     help = "Ingest movies into local Chroma vector store"
 
-    def handle(self, *args, **options):
-        # 1. Setup ChromaDB Client
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        collection_name = "movies_collection"
-        
-        # Reset collection to ensure fresh data
-        try:
-            client.delete_collection(collection_name)
-        except Exception:
-            pass
-            
-        collection = client.create_collection(
-            name=collection_name, 
-            metadata={"source": "movies"}
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only re-embed movies whose content changed and drop chunks of deleted movies",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Only re-embed the batches a previous run wrote to the retry file",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=getattr(settings, "EMBEDDING_WORKERS", 4),
+            help="Concurrent embedding requests",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=getattr(settings, "EMBEDDING_RATE_LIMIT", 5.0),
+            help="Maximum embedding API requests per second",
+        )
+        parser.add_argument(
+            "--retry-file",
+            default=RETRY_FILE,
+            help="Where batches that still fail after all retries are saved",
         )
 
-        # 2. Setup Embedding Model
-        embeddings_model = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004", 
-            google_api_key=os.getenv("GOOGLE_API_KEY")
+    def handle(self, *args, **options):
+        incremental = options["incremental"]
+        retry_failed = options["retry_failed"]
+
+        # 1. Setup Embedding Model: cache in front, rate limiter + retries behind it,
+        # so only real API calls spend quota
+        pooled = get_embeddings_model()
+        embeddings_model = CachedEmbeddings(
+            RateLimitedEmbeddings(pooled.embeddings_model, TokenBucket(options["rate"])),
+            model_name=pooled.model_name,
+            cache=pooled.cache,
         )
 
+        def write(batch, embeddings):
+            get_collection(batch["collection"]).upsert(
+                ids=batch["ids"],
+                documents=batch["documents"],
+                metadatas=batch["metadatas"],
+                embeddings=embeddings
+            )
+
+        if retry_failed:
+            active, active_version = resolve_alias()
+            batches = load_retry_file(options["retry_file"])
+            for batch in batches:
+                batch.setdefault("collection", active)
+            print(f"🔁 Retrying {len(batches)} failed batches...")
+            written, failed = run_pipeline(batches, embeddings_model, write, workers=options["workers"])
+            write_retry_file(options["retry_file"], failed)
+            print(f"✅ Stored {written} chunks, {len(failed)} batches still failing.")
+
+            # A rebuild that was held back because of failed batches can go live now,
+            # unless a newer one went live in the meantime
+            for name in {batch["collection"] for batch in batches} - {active}:
+                if version_of(name) > active_version and is_complete(get_collection(name)):
+                    self._switch(name)
+                    self._refresh_derived()
+            return
+
+        # 2. Pick the target collection. Incremental runs patch the live collection
+        # in place; full rebuilds fill a new version that is switched to at the end,
+        # so queries keep hitting the old one for the whole ingest.
+        collection = get_active_collection(create=True) if incremental else None
+
+        # What is already stored: movie_id -> (content hash, chunk ids)
+        stored = {}
+        if incremental:
+            existing = collection.get(include=["metadatas"])
+            for chunk_id, meta in zip(existing["ids"], existing["metadatas"]):
+                entry = stored.setdefault(int(meta["movie_id"]), [meta.get("content_hash"), []])
+                entry[1].append(chunk_id)
+
         docs, metadatas, ids = [], [], []
-        movies = Movie.objects.all()
+        stale_ids = []
+        summary = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+        movies = Movie.objects.prefetch_related("genres")
 
         print(f"🎬 Processing {movies.count()} movies...")
 
         # 3. Process Movies
+        seen_movie_ids = set()
         for m in movies:
+            seen_movie_ids.add(m.id)
+            genre_names = ", ".join([g.name for g in m.genres.all()])
+            movie_hash = content_hash(m, genre_names)
+
+            if incremental:
+                previous = stored.get(m.id)
+                if previous is None:
+                    summary["added"] += 1
+                elif previous[0] == movie_hash:
+                    summary["unchanged"] += 1
+                    continue
+                else:
+                    summary["updated"] += 1
+
             # Handle Poster URL safely
             try:
                 if hasattr(m.poster, 'url'):
@@ -82,47 +184,88 @@ class Command(BaseCommand):
                 detail_link = f"/movies/{m.id}/"
 
             # Prepare Text Content
-            genre_names = ", ".join([g.name for g in m.genres.all()])
             doc_text = f"Title: {m.title}. Year: {m.year}. Genre: {genre_names}. Plot: {m.description or ''}"
             chunks = chunk_text(doc_text)
-            
+
             # Prepare Data for Embedding
+            movie_chunk_ids = []
             for i, chunk in enumerate(chunks):
-                ids.append(f"movie_{m.id}_chunk_{i}")
+                movie_chunk_ids.append(f"movie_{m.id}_chunk_{i}")
                 docs.append(chunk)
                 metadatas.append({
                     "movie_id": m.id,
                     "title": m.title,
                     "year": m.year,
                     "genre": genre_names,
-                    "poster_url": poster_path, 
-                    "detail_link": detail_link 
+                    "poster_url": poster_path,
+                    "detail_link": detail_link,
+                    "content_hash": movie_hash,
                 })
+            ids.extend(movie_chunk_ids)
 
-        # 4. Batch Embed and Save to ChromaDB
-        BATCH_SIZE = 5
-        total_chunks = len(docs)
-        
-        print(f"📦 Embedding {total_chunks} text chunks...")
+            # A shorter plot can leave trailing chunks from the old version behind
+            if incremental and m.id in stored:
+                stale_ids.extend(set(stored[m.id][1]) - set(movie_chunk_ids))
 
-        for i in range(0, total_chunks, BATCH_SIZE):
-            batch_docs = docs[i : i + BATCH_SIZE]
-            print(f"   Processing batch {i} to {min(i + BATCH_SIZE, total_chunks)}...")
-            
-            try:
-                batch_embeddings = embeddings_model.embed_documents(batch_docs)
-                
-                collection.add(
-                    ids=ids[i : i + len(batch_docs)],
-                    documents=batch_docs,
-                    metadatas=metadatas[i : i + len(batch_docs)],
-                    embeddings=batch_embeddings
-                )
-                
-                # Small sleep to avoid hitting API rate limits
-                time.sleep(1)
-                
-            except Exception as e:
-                print(f"❌ Error in batch {i}: {e}")
-
-        print("✅ Done! All movies ingested.")
\ No newline at end of file
+        # Chunks of movies that no longer exist in the database
+        for movie_id, (_, chunk_ids) in stored.items():
+            if movie_id not in seen_movie_ids:
+                summary["deleted"] += 1
+                stale_ids.extend(chunk_ids)
+
+        if stale_ids:
+            collection.delete(ids=stale_ids)
+
+        if not incremental:
+            collection, version = create_versioned_collection(expected_chunks=len(ids))
+            print(f"🆕 Building {collection.name}...")
+
+        # 4. Embed batches concurrently and save them to ChromaDB as they finish
+        batches = make_batches(ids, docs, metadatas)
+        for batch in batches:
+            batch["collection"] = collection.name
+        print(f"📦 Embedding {len(docs)} text chunks in {len(batches)} batches "
+              f"({options['workers']} workers, {options['rate']} req/s)...")
+
+        written, failed = run_pipeline(batches, embeddings_model, write, workers=options["workers"])
+        write_retry_file(options["retry_file"], failed)
+        if failed:
+            print(f"⚠️ {len(failed)} batches failed and were saved to {options['retry_file']}. "
+                  f"Run again with --retry-failed.")
+
+        if not incremental:
+            # 5. Validate the new version and switch the alias to it
+            if is_complete(collection):
+                self._switch(collection.name)
+            else:
+                print(f"⚠️ {collection.name} has {collection.count()}/{len(ids)} chunks; "
+                      f"keeping the current collection live.")
+                return
+
+        print("✅ Done! All movies ingested.")
+        if incremental:
+            print(
+                f"📊 Added: {summary['added']}, updated: {summary['updated']}, "
+                f"deleted: {summary['deleted']}, unchanged: {summary['unchanged']}"
+            )
+        print(f"🧠 Embedding cache: {get_embedding_cache().stats()}")
+
+        # 6. Refresh everything derived from the live collection
+        self._refresh_derived()
+        if incremental and (summary["added"] or summary["updated"] or summary["deleted"]):
+            # Edited in place, so the version stayed: tell answer caches explicitly
+            bump_generation()
+
+    def _refresh_derived(self):
+        if BACKEND == "numpy":
+            name, version = resolve_alias()
+            count = export_numpy_index(get_collection(name), version)
+            print(f"💾 Exported {count} vectors for the NumPy backend.")
+        call_command("build_similar_movies", stdout=self.stdout)
+
+    def _switch(self, collection_name):
+        version = activate(collection_name)
+        print(f"🔀 Alias now points at {collection_name} (v{version}).")
+        deleted = garbage_collect()
+        if deleted:
+            print(f"🗑️ Removed old collections: {', '.join(deleted)}")
\ No newline at end of file
@@ -1,27 +1,183 @@
-from django.core.management.base import BaseCommand
-from django.db.models import Avg
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from movies.models import Movie
+from jobs.models import Job
+from movies.models import Movie, MovieRatingCount, RatingRecalculation
+from movies.ratings import rating_updates
+from movies.tasks import apply_review_change
 from reviews.models import Review
 
+LAST_UPDATE = 'last-update'
+
+
+def _single_snapshot():
+    """Make every read in the current transaction see the same commits."""
+    # Postgres' default (READ COMMITTED) takes a new snapshot per statement;
+    # SQLite already reads from one snapshot per transaction
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+
+def _job_movie(job_args, job_kwargs):
+    return job_args[0] if job_args else job_kwargs.get('movie_id')
+
 
 class Command(BaseCommand):
     help = 'Recalculate average movie ratings from user reviews and store in Movie.rating'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--since', nargs='?', const=LAST_UPDATE, default=None,
+                            help='Only movies with reviews written or edited after the given '
+                                 'date/datetime, or (without a value) since the last complete run')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Compute and report the changes without writing them')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk UPDATE/INSERT (default: 1000)')
+
+    def _since(self, since):
+        """The moment a --since run starts from; None for the whole catalog."""
+        if since is None:
+            return None
+        if since == LAST_UPDATE:
+            # Without a completed run to start from, this is a full run
+            return RatingRecalculation.objects.values_list('last_run', flat=True).first()
+
+        moment = parse_datetime(since)
+        if moment is None:
+            day = parse_date(since)
+            if day is None:
+                raise CommandError(f'Invalid --since value: {since!r} (expected YYYY-MM-DD or an ISO datetime)')
+            moment = datetime.combine(day, datetime.min.time())
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def _scope(self, since):
+        """Q objects selecting the movies (and their reviews) this run looks at."""
+        if since is None:
+            return Q(), Q()
+        touched = Review.objects.filter(updated__gte=since).values('movie_id')
+        # A rating job that gave up left its movie's counters behind (a review
+        # deleted with no other trace, for instance)
+        failed = {
+            _job_movie(args, kwargs) for args, kwargs in
+            Job.objects.filter(task=apply_review_change.name, status=Job.FAILED, finished__gte=since)
+            .values_list('args', 'kwargs')
+        }
+        return Q(id__in=touched) | Q(id__in=failed), Q(movie_id__in=touched) | Q(movie_id__in=failed)
+
+    def _pending(self):
+        """
+        What queued and running rating jobs will still add: ({movie_id: (sum, count)},
+        {(movie_id, score): count}). A running job has not committed, so its
+        change is not in the counters yet either.
+        """
+        totals, bars = {}, {}
+        jobs = Job.objects.filter(task=apply_review_change.name, status__in=[Job.QUEUED, Job.RUNNING])
+        for args, kwargs in jobs.values_list('args', 'kwargs').iterator():
+            movie_id = _job_movie(args, kwargs)
+            added, removed = kwargs.get('added'), kwargs.get('removed')
+            if added == removed:
+                continue
+            total, n = totals.get(movie_id, (0, 0))
+            totals[movie_id] = (total + (added or 0) - (removed or 0),
+                                n + (added is not None) - (removed is not None))
+            for score, delta in ((added, 1), (removed, -1)):
+                if score is not None:
+                    bars[movie_id, score] = bars.get((movie_id, score), 0) + delta
+        return totals, bars
+
     def handle(self, *args, **options):
-        movies = Movie.objects.all()
-        total = movies.count()
-        self.stdout.write(f'Recalculating ratings for {total} movies...')
-        for i, movie in enumerate(movies, start=1):
-            agg = Review.objects.filter(movie=movie).aggregate(avg_rating=Avg('rating'))
-            avg = agg['avg_rating']
-            if avg is None:
-                movie.rating = 0.0
-            else:
-                # keep average on same 1-10 scale as Review
-                movie.rating = float(avg)
-            movie.rating_last_updated = timezone.now()
-            movie.save(update_fields=['rating', 'rating_last_updated'])
-            self.stdout.write(f'[{i}/{total}] {movie.title}: {movie.rating}')
-        self.stdout.write('Done.')
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        full_or_resumed = options['since'] in (None, LAST_UPDATE)
+        # Reviews written from here on are left to the next run
+        run_started = timezone.now()
+        movie_scope, review_scope = self._scope(self._since(options['since']))
+
+        # 1. Stored counters, review totals and not-yet-applied rating jobs, all
+        # from one snapshot: a review and its job commit together, so every
+        # review the GROUP BY sees is either in the counters or still pending.
+        with transaction.atomic():
+            _single_snapshot()
+            current = {m_id: (total, n) for m_id, total, n in
+                       Movie.objects.filter(movie_scope).values_list('id', 'rating_sum', 'rating_count')}
+            self.stdout.write(f'Recalculating ratings for {len(current)} movies...')
+            stored_bars = {(m_id, score): n for m_id, score, n in
+                           MovieRatingCount.objects.filter(review_scope)
+                           .values_list('movie_id', 'score', 'count')}
+            reviews = Review.objects.filter(review_scope)
+            totals = {row['movie_id']: (row['total'], row['n']) for row in
+                      reviews.values('movie_id').annotate(total=Sum('rating'), n=Count('id')).order_by()}
+            bars = {(row['movie_id'], row['rating']): row['n'] for row in
+                    reviews.values('movie_id', 'rating').annotate(n=Count('id')).order_by()}
+            pending_totals, pending_bars = self._pending()
+        aggregated = time.perf_counter()
+        self.stdout.write(f'Aggregated {len(totals)} movies with reviews in {aggregated - started:.2f}s')
+
+        # 2. What the counters lack once the pending jobs have run. Applied as
+        # F() deltas, like the jobs, so jobs finishing meanwhile are not undone
+        # and jobs still queued are not counted twice.
+        drift = {}
+        for m_id, (stored_total, stored_n) in current.items():
+            total, n = totals.get(m_id, (0, 0))
+            pending_total, pending_n = pending_totals.get(m_id, (0, 0))
+            sum_delta = total - pending_total - stored_total
+            count_delta = n - pending_n - stored_n
+            if sum_delta or count_delta:
+                drift[m_id] = (sum_delta, count_delta)
+                if dry_run and len(drift) <= 20:
+                    self.stdout.write(f'  movie {m_id}: {stored_total}/{stored_n} -> '
+                                      f'{stored_total + sum_delta}/{stored_n + count_delta} (sum/reviews)')
+        bar_drift = {}
+        for key in stored_bars.keys() | bars.keys() | pending_bars.keys():
+            if key[0] in current:
+                delta = bars.get(key, 0) - pending_bars.get(key, 0) - stored_bars.get(key, 0)
+                if delta:
+                    bar_drift[key] = delta
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(drift)} of {len(current)} movies would change, {len(bar_drift)} histogram '
+                f'bars ({time.perf_counter() - started:.2f}s). Nothing was written.'
+            ))
+            return
+
+        # 3. Apply in chunks
+        with transaction.atomic():
+            Movie.objects.bulk_update(
+                [Movie(id=m_id, **rating_updates(*deltas)) for m_id, deltas in drift.items()],
+                ['rating_sum', 'rating_count', 'rating', 'rating_last_updated'], batch_size=batch_size,
+            )
+            MovieRatingCount.objects.bulk_create(
+                [MovieRatingCount(movie_id=m_id, score=score) for m_id, score in bar_drift],
+                batch_size=batch_size, ignore_conflicts=True,
+            )
+            movie_ids = sorted({m_id for m_id, _ in bar_drift})
+            bar_ids = {}
+            for i in range(0, len(movie_ids), batch_size):
+                bar_ids.update(
+                    ((m_id, score), pk) for pk, m_id, score in
+                    MovieRatingCount.objects.filter(movie_id__in=movie_ids[i:i + batch_size])
+                    .values_list('id', 'movie_id', 'score')
+                )
+            MovieRatingCount.objects.bulk_update(
+                [MovieRatingCount(id=bar_ids[key], count=F('count') + delta) for key, delta in bar_drift.items()],
+                ['count'], batch_size=batch_size,
+            )
+            if full_or_resumed:
+                RatingRecalculation.objects.update_or_create(pk=1, defaults={'last_run': run_started})
+        written = time.perf_counter()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {len(drift)} of {len(current)} movies and {len(bar_drift)} histogram bars '
+            f'in {written - aggregated:.2f}s, total {written - started:.2f}s.'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.rankings import refresh_rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized popularity/trending rankings used by the homepage (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = refresh_rankings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Ranked {written} movies in {time.perf_counter() - started:.2f}s.'
+        ))
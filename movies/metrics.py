@@ -0,0 +1,24 @@
+def cache_metrics():
+    """filmmate.metrics collector: this worker's chatbot, embedding and search caches."""
+    # Imported on the first scrape, not in MoviesConfig.ready (pulls in the vector clients)
+    from .search import result_cache_stats
+    from .vector.embedding_cache import get_embedding_cache
+    from .vector.semantic_cache import get_semantic_cache
+
+    semantic = get_semantic_cache().stats()
+    embedding = get_embedding_cache().stats()
+    search = result_cache_stats()
+    return [
+        ("semantic_cache_lookups_total", "counter", "Chatbot answer cache lookups",
+         [({"result": "hit"}, semantic["hits"]), ({"result": "miss"}, semantic["misses"])]),
+        ("semantic_cache_saved_seconds_total", "counter", "LLM latency saved by chatbot answer cache hits",
+         [({}, semantic["saved_seconds"])]),
+        ("semantic_cache_entries", "gauge", "Chatbot answers cached", [({}, semantic["entries"])]),
+        ("embedding_cache_lookups_total", "counter", "Embedding cache lookups",
+         [({"result": "memory_hit"}, embedding["memory_hits"]), ({"result": "disk_hit"}, embedding["disk_hits"]),
+          ({"result": "miss"}, embedding["misses"])]),
+        ("embedding_cache_entries", "gauge", "Embeddings in the in-memory tier", [({}, embedding["memory_entries"])]),
+        ("search_cache_lookups_total", "counter", "Search result cache lookups",
+         [({"result": "hit"}, search["hits"]), ({"result": "miss"}, search["misses"])]),
+        ("search_cache_entries", "gauge", "Search results cached", [({}, search["entries"])]),
+    ]
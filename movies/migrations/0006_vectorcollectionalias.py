@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_similarmovie'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VectorCollectionAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('alias', models.CharField(max_length=100, unique=True)),
+                ('collection_name', models.CharField(max_length=100)),
+                ('version', models.PositiveIntegerField()),
+                ('switched_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,60 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    MovieRatingCount = apps.get_model('movies', 'MovieRatingCount')
+    Review = apps.get_model('reviews', 'Review')
+
+    totals = Review.objects.values('movie_id').annotate(total=Sum('rating'), n=Count('id'))
+    movies = []
+    for row in totals:
+        movies.append(Movie(
+            id=row['movie_id'],
+            rating_sum=row['total'],
+            rating_count=row['n'],
+            rating=round(row['total'] / row['n'], 1),
+        ))
+    Movie.objects.bulk_update(movies, ['rating_sum', 'rating_count', 'rating'], batch_size=1000)
+
+    buckets = Review.objects.values('movie_id', 'rating').annotate(n=Count('id'))
+    MovieRatingCount.objects.bulk_create(
+        [MovieRatingCount(movie_id=row['movie_id'], score=row['rating'], count=row['n']) for row in buckets],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_vectorcollectionalias'),
+        ('reviews', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='MovieRatingCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_counts', to='movies.movie')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('movie', 'score'), name='unique_movie_rating_score')],
+            },
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRanking',
+            fields=[
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='movies.movie')),
+                ('popularity_score', models.FloatField(default=0.0)),
+                ('trending_score', models.FloatField(default=0.0)),
+                ('trending_epoch', models.DateTimeField()),
+                ('prior_mean', models.FloatField(default=0.0)),
+                ('watch_count', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-trending_score', '-popularity_score'], name='movie_ranking_trending_idx')],
+            },
+        ),
+    ]
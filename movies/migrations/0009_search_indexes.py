@@ -0,0 +1,39 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def add_search_indexes(apps, schema_editor):
+    # Postgres only; on SQLite (local tests) search falls back to the in-process index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('movies', 'Movie')._meta.db_table)
+    schema_editor.execute(f"""
+        ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(director, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'C')
+        ) STORED
+    """)
+    schema_editor.execute(f"CREATE INDEX movies_movie_search_vector_gin ON {table} USING GIN (search_vector)")
+    schema_editor.execute(f"CREATE INDEX movies_movie_title_trgm ON {table} USING GIN (title gin_trgm_ops)")
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('movies', 'Movie')._meta.db_table)
+    schema_editor.execute("DROP INDEX IF EXISTS movies_movie_title_trgm")
+    schema_editor.execute("DROP INDEX IF EXISTS movies_movie_search_vector_gin")
+    schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_movieranking'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
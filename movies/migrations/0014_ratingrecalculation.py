@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0013_cowatchedmovie_computed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingRecalculation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_run', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0015_signed_rating_counters'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='movieranking',
+            name='watch_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_tastes_stale(apps, schema_editor):
+    # Built before per-movie weights were kept: rebuild on next read
+    apps.get_model('movies', 'UserTaste').objects.update(store_version=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0016_signed_watch_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='usertaste',
+            name='store_version',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='UserTasteWeight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movie_id', models.PositiveIntegerField()),
+                ('weight', models.FloatField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='taste_weights', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'movie_id'), name='unique_user_taste_weight')],
+            },
+        ),
+        migrations.RunPython(mark_tastes_stale, migrations.RunPython.noop),
+    ]
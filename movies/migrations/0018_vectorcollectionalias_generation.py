@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0017_usertasteweight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vectorcollectionalias',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -13,13 +13,42 @@ class Movie(models.Model):
     poster = models.URLField(max_length=255, blank=True, null=True)
     description = models.TextField()
     # Average rating computed from user reviews. Default 0.0 when no reviews.
+    # Derived from rating_sum / rating_count whenever a review is written.
     rating = models.FloatField(default=0.0)
     # Timestamp when rating was last recalculated
     rating_last_updated = models.DateTimeField(null=True, blank=True)
+    # Running totals over all reviews, kept up to date by movies.ratings.
+    # Signed: review jobs may run out of order, so a removal can briefly
+    # land before the addition it undoes.
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
 
     def __str__(self):
         return f"{self.title} ({self.year})"
 
+    def rating_histogram(self):
+        """Number of reviews per score, as a list indexed 0..9 for scores 1..10."""
+        histogram = [0] * 10
+        for score, count in self.rating_counts.values_list('score', 'count'):
+            histogram[score - 1] = max(count, 0)
+        return histogram
+
+
+
+class MovieRatingCount(models.Model):
+    """How many reviews gave a movie a particular score (one histogram bar)."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='rating_counts')
+    score = models.PositiveSmallIntegerField()
+    # Signed like Movie.rating_count (see movies.ratings)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'score'], name='unique_movie_rating_score')
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title}: {self.count} x {self.score}/10"
 
 
 class WatchedMovie(models.Model):
@@ -32,3 +61,148 @@ class WatchedMovie(models.Model):
 
     def __str__(self):
         return f"{self.user.username} watched {self.movie.title}"
+
+
+class SimilarMovie(models.Model):
+    """Precomputed nearest neighbour of a movie in the vector store."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='similar_entries')
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    # Vector-store distance between the two movies (lower is closer)
+    distance = models.FloatField()
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['movie', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'rank'], name='unique_similar_movie_rank')
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title} ~ {self.similar.title} (#{self.rank})"
+
+
+class CoWatchedMovie(models.Model):
+    """
+    Precomputed neighbour of a movie by watch/review history ("people who
+    watched this also watched"), see movies.collaborative.
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='cowatched_entries')
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    # Cosine similarity of the two movies' audience vectors (higher is closer)
+    score = models.FloatField()
+    # When the build that wrote it started reading history (the --incremental watermark)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['movie', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['movie', 'rank'], name='unique_cowatched_movie_rank')
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title} ~ {self.similar.title} (#{self.rank})"
+
+
+class UserTaste(models.Model):
+    """
+    A user's taste in embedding space: the running rating-weighted sum of
+    the embeddings of the movies they watched or reviewed (see movies.taste).
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='taste')
+    # float32 vector; divide by weight_sum for the mean
+    vector_sum = models.BinaryField()
+    weight_sum = models.FloatField(default=0.0)
+    # Vector store version the sum was built from; a re-ingest makes it stale.
+    # None for the placeholder written before the first build.
+    store_version = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"taste of {self.user.username} ({self.weight_sum:.1f})"
+
+
+class UserTasteWeight(models.Model):
+    """How much one movie's embedding is currently counted in a UserTaste."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='taste_weights')
+    # Not a foreign key: a deleted movie's weight must outlive it until its
+    # share is taken back out of the sum
+    movie_id = models.PositiveIntegerField()
+    weight = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'movie_id'], name='unique_user_taste_weight')
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: movie {self.movie_id} x {self.weight:.1f}"
+
+
+class VectorCollectionAlias(models.Model):
+    """
+    Points a stable alias (e.g. "movies_collection") at the versioned Chroma
+    collection that queries should currently use.
+    """
+    alias = models.CharField(max_length=100, unique=True)
+    collection_name = models.CharField(max_length=100)
+    version = models.PositiveIntegerField()
+    # Bumped when `ingest_chroma --incremental` edits the live collection in
+    # place, which leaves `version` alone (see movies.vector.versions)
+    generation = models.PositiveIntegerField(default=0)
+    switched_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.alias} -> {self.collection_name}"
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter bumped whenever a movie, genre or genre link changes;
+    workers rebuild their in-memory catalog snapshot when it moves.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"catalog v{self.version}"
+
+
+class RatingRecalculation(models.Model):
+    """
+    Single row holding the start time of the last complete
+    `recalculate_movie_ratings` run; a bare `--since` only looks at reviews
+    written after it.
+    """
+    last_run = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"ratings recalculated {self.last_run}"
+
+
+class MovieRanking(models.Model):
+    """
+    Materialized homepage ranking of a movie, rebuilt by `refresh_rankings`
+    and nudged in between by review/watch signals (see movies.rankings).
+    """
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, primary_key=True, related_name='ranking')
+    # Bayesian-weighted rating: the movie's average pulled towards prior_mean
+    popularity_score = models.FloatField(default=0.0)
+    # Exponentially decayed activity, valued at trending_epoch
+    trending_score = models.FloatField(default=0.0)
+    trending_epoch = models.DateTimeField()
+    # Site-wide average rating at the last full refresh
+    prior_mean = models.FloatField(default=0.0)
+    # Signed: an unwatch job may run before the watch it undoes (see jobs.queue)
+    watch_count = models.IntegerField(default=0)
+    computed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-trending_score', '-popularity_score'], name='movie_ranking_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title}: trending {self.trending_score:.2f}, popularity {self.popularity_score:.2f}"
@@ -0,0 +1,53 @@
+"""
+The signed-in user's state for a page of movies: watched, in the
+watchlist, and their own rating.
+
+Grids ask for all of a page's ids at once, so badges cost at most three
+queries per page whatever its size. Results are kept on the request, so
+several grids on one page (or a view and its template) share them.
+"""
+from lists.models import List
+from movies.models import WatchedMovie
+from reviews.models import Review
+
+WATCHLIST_NAME = "Watchlist"
+
+# Most ids one JSON request may ask about
+MAX_IDS = 100
+
+
+def empty_state():
+    return {"watched": False, "watchlisted": False, "rating": None}
+
+
+def load_states(user, movie_ids):
+    """{movie_id: state} for `movie_ids`, in at most three queries."""
+    movie_ids = set(movie_ids)
+    states = {movie_id: empty_state() for movie_id in movie_ids}
+    if not movie_ids or not user.is_authenticated:
+        return states
+
+    watched = WatchedMovie.objects.filter(user=user, movie_id__in=movie_ids)
+    for movie_id in watched.values_list("movie_id", flat=True):
+        states[movie_id]["watched"] = True
+
+    watchlisted = List.movies.through.objects.filter(
+        list__user=user, list__name=WATCHLIST_NAME, movie_id__in=movie_ids
+    )
+    for movie_id in watchlisted.values_list("movie_id", flat=True):
+        states[movie_id]["watchlisted"] = True
+
+    # Oldest first, so the latest review of a movie wins
+    reviews = Review.objects.filter(user=user, movie_id__in=movie_ids).order_by("date")
+    for movie_id, rating in reviews.values_list("movie_id", "rating"):
+        states[movie_id]["rating"] = rating
+    return states
+
+
+def movie_states(request, movie_ids):
+    """Like load_states for request.user, but only fetches ids this request has not seen."""
+    cache = request.__dict__.setdefault("_movie_states", {})
+    missing = [movie_id for movie_id in movie_ids if movie_id not in cache]
+    if missing:
+        cache.update(load_states(request.user, missing))
+    return {movie_id: cache[movie_id] for movie_id in movie_ids}
@@ -0,0 +1,112 @@
+"""
+Popularity and trending scores behind the homepage.
+
+`refresh_rankings` recomputes every MovieRanking row in bulk (run it from
+cron via the refresh_rankings command). Between refreshes the review and
+watch signals queue `record_activity` / `update_popularity` (movies.tasks),
+which touch a single row each.
+
+Trending activity decays with a half-life of RANKING_TRENDING_HALF_LIFE_HOURS.
+All rows store their score valued at the same `trending_epoch` (the last
+refresh), so they can be compared and ordered by the column directly; a new
+event adds weight * 2 ** ((event time - epoch) / half-life).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from movies.models import Movie, MovieRanking, WatchedMovie
+from reviews.models import Review
+
+PRIOR_WEIGHT = getattr(settings, "RANKING_PRIOR_WEIGHT", 10)
+HALF_LIFE = timedelta(hours=getattr(settings, "RANKING_TRENDING_HALF_LIFE_HOURS", 72))
+TRENDING_WINDOW = timedelta(days=getattr(settings, "RANKING_TRENDING_WINDOW_DAYS", 30))
+
+# How much one event moves the trending score
+REVIEW_WEIGHT = 2.0
+WATCH_WEIGHT = 1.0
+
+
+def decay_factor(when, epoch):
+    """Weight of an event at `when`, valued at `epoch` (>1 for events after it)."""
+    return 2 ** ((when - epoch) / HALF_LIFE)
+
+
+def bayesian_rating(rating_sum, rating_count, prior_mean, prior_weight=PRIOR_WEIGHT):
+    """Average rating with `prior_weight` virtual reviews at `prior_mean` mixed in."""
+    return (rating_sum + prior_weight * prior_mean) / (rating_count + prior_weight)
+
+
+def refresh_rankings(now=None, batch_size=1000):
+    """Rebuild every MovieRanking row; returns the number of rows written."""
+    now = now or timezone.now()
+    totals = Movie.objects.aggregate(total=Sum('rating_sum'), n=Sum('rating_count'))
+    prior_mean = (totals['total'] or 0) / totals['n'] if totals['n'] else 0.0
+
+    watch_counts = dict(
+        WatchedMovie.objects.values('movie_id').annotate(n=Count('id')).order_by().values_list('movie_id', 'n')
+    )
+
+    since = now - TRENDING_WINDOW
+    trending = {}
+    for weight, events in (
+        (REVIEW_WEIGHT, Review.objects.filter(date__gte=since).values_list('movie_id', 'date')),
+        (WATCH_WEIGHT, WatchedMovie.objects.filter(watched_at__gte=since).values_list('movie_id', 'watched_at')),
+    ):
+        for movie_id, when in events.iterator(chunk_size=batch_size):
+            trending[movie_id] = trending.get(movie_id, 0.0) + weight * decay_factor(when, now)
+
+    rows = [
+        MovieRanking(
+            movie_id=movie_id,
+            popularity_score=bayesian_rating(rating_sum, rating_count, prior_mean),
+            trending_score=trending.get(movie_id, 0.0),
+            trending_epoch=now,
+            prior_mean=prior_mean,
+            watch_count=watch_counts.get(movie_id, 0),
+        )
+        for movie_id, rating_sum, rating_count in Movie.objects.values_list('id', 'rating_sum', 'rating_count')
+    ]
+
+    # Swap the whole table in one transaction so the homepage never sees it half-built
+    with transaction.atomic():
+        MovieRanking.objects.all().delete()
+        MovieRanking.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def record_activity(movie_id, weight, when=None, watch_delta=0):
+    """Add one review/watch event to a movie's trending score."""
+    when = when or timezone.now()
+    epoch = MovieRanking.objects.filter(movie_id=movie_id).values_list('trending_epoch', flat=True).first()
+    if epoch is None:
+        # Movie added after the last refresh; the next refresh ranks it
+        return
+    updates = {'trending_score': F('trending_score') + weight * decay_factor(when, epoch)}
+    if watch_delta:
+        updates['watch_count'] = F('watch_count') + watch_delta
+    MovieRanking.objects.filter(movie_id=movie_id).update(**updates)
+
+
+def update_popularity(movie_id):
+    """Recompute one movie's Bayesian rating from its denormalized counters."""
+    movie = Movie.objects.filter(pk=OuterRef('movie_id'))
+    MovieRanking.objects.filter(movie_id=movie_id).update(
+        popularity_score=(
+            (Cast(Subquery(movie.values('rating_sum')), FloatField()) + PRIOR_WEIGHT * F('prior_mean'))
+            / (Cast(Subquery(movie.values('rating_count')), FloatField()) + PRIOR_WEIGHT)
+        ),
+    )
+
+
+def ranked_movies(limit):
+    """Top movies for the homepage: trending first, Bayesian rating as tie-break."""
+    rankings = (
+        MovieRanking.objects.select_related('movie')
+        .order_by('-trending_score', '-popularity_score')[:limit]
+    )
+    return [ranking.movie for ranking in rankings]
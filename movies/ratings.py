@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+from movies.models import Movie, MovieRatingCount
+
+
+def rating_updates(sum_delta, count_delta):
+    """UPDATE values adding the deltas to a movie's totals and re-deriving its average."""
+    new_sum = F('rating_sum') + sum_delta
+    new_count = F('rating_count') + count_delta
+    # Every SET expression sees the row before the update, so the average
+    # is computed from the new totals explicitly.
+    return {
+        'rating_sum': new_sum,
+        'rating_count': new_count,
+        'rating': Coalesce(
+            Round(Cast(new_sum, FloatField()) / NullIf(Greatest(new_count, Value(0)), Value(0)), 1),
+            Value(0.0),
+        ),
+        'rating_last_updated': timezone.now(),
+    }
+
+
+def apply_rating_change(movie_id, added=None, removed=None):
+    """
+    Fold one review write into the movie's rating counters.
+
+    `added` is the score that now counts for the movie, `removed` the score
+    that no longer does (both for an edit, one of them for a create or
+    delete). Everything is a single UPDATE with F() expressions, so the cost
+    does not depend on how many reviews the movie has and concurrent writes
+    cannot lose each other's changes.
+
+    The jobs calling this may run in any order (see jobs.queue), so every
+    step is a commutative delta: a removal that arrives before the addition
+    it undoes takes the counters below zero until that addition lands.
+    """
+    if added == removed:
+        return
+    count_delta = (added is not None) - (removed is not None)
+    sum_delta = (added or 0) - (removed or 0)
+    with transaction.atomic():
+        Movie.objects.filter(pk=movie_id).update(**rating_updates(sum_delta, count_delta))
+        if added is not None:
+            add_to_histogram(movie_id, added, 1)
+        if removed is not None:
+            add_to_histogram(movie_id, removed, -1)
+
+
+def add_to_histogram(movie_id, score, delta):
+    """Move one histogram bar by `delta`, creating the bar if needed."""
+    bucket, _ = MovieRatingCount.objects.get_or_create(movie_id=movie_id, score=score)
+    MovieRatingCount.objects.filter(pk=bucket.pk).update(count=F('count') + delta)
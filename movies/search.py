@@ -0,0 +1,241 @@
+import bisect
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramWordSimilarity
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from movies.catalog import catalog_stamp
+from movies.models import Movie
+from movies.vector.clients import GOOGLE_API_KEY, get_embeddings_model
+from movies.vector.stores import get_vector_store
+
+# Seconds the per-worker BM25 index is trusted before checking the catalog again
+INDEX_CHECK_SECONDS = getattr(settings, "SEARCH_INDEX_CHECK_SECONDS", 60)
+RESULT_CACHE_SIZE = getattr(settings, "SEARCH_RESULT_CACHE_SIZE", 256)
+RESULT_CACHE_TTL = getattr(settings, "SEARCH_RESULT_CACHE_TTL", 300)
+
+# Reciprocal-rank fusion constant (the usual k=60 from the RRF paper)
+RRF_K = 60
+# How many hits each ranker contributes to the fusion. Nearest neighbours
+# exist for any query, so the vector side is kept short to add semantic
+# matches without padding the results with the whole catalog.
+CANDIDATES = 100
+VECTOR_CANDIDATES = 24
+# Nearest neighbours farther than this (squared L2 of unit vectors, i.e.
+# 2 - 2 * cosine) are unrelated to the query and left out of the fusion
+VECTOR_MAX_DISTANCE = getattr(settings, "SEARCH_VECTOR_MAX_DISTANCE", 0.9)
+# Field weights: a title match counts three times as much as a plot match
+FIELD_WEIGHTS = {"title": 3, "director": 2, "description": 1}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+class BM25Index:
+    """Okapi BM25 over title, director and description of every movie."""
+
+    k1 = 1.5
+    b = 0.75
+
+    def __init__(self, rows):
+        self.doc_ids = []
+        self.doc_lengths = []
+        self.postings = defaultdict(list)  # term -> [(doc index, weighted tf)]
+        for row in rows:
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in tokenize(row[field]):
+                    counts[term] += weight
+            index = len(self.doc_ids)
+            self.doc_ids.append(row["id"])
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((index, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, term):
+        """Exact term plus vocabulary words it prefixes (so "star" finds "starship")."""
+        if len(term) < 3:
+            return [term] if term in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, term)
+        end = bisect.bisect_left(self.vocabulary, term + "\uffff")
+        return self.vocabulary[start:end]
+
+    def search(self, query, limit=CANDIDATES):
+        """Return movie ids ranked by BM25 score."""
+        n = len(self.doc_ids)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            for expanded in self._expand(term):
+                postings = self.postings[expanded]
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for index, tf in postings:
+                    norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / self.avg_length)
+                    scores[index] += idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores, key=scores.get, reverse=True)[:limit]
+        return [self.doc_ids[i] for i in ranked]
+
+
+_lock = threading.Lock()
+_index = None
+_index_built_for = None
+_index_stamp = None
+_index_checked_at = 0.0
+_results = OrderedDict()  # (query, stamp) -> (ranked ids, created)
+_result_stats = {"hits": 0, "misses": 0}
+
+
+def current_stamp():
+    """Catalog fingerprint, re-read at most every INDEX_CHECK_SECONDS."""
+    global _index_stamp, _index_checked_at
+    now = time.monotonic()
+    if _index_stamp is not None and now - _index_checked_at < INDEX_CHECK_SECONDS:
+        return _index_stamp
+    stamp = catalog_stamp()
+    with _lock:
+        _index_checked_at = now
+        if stamp != _index_stamp:
+            _index_stamp = stamp
+            _results.clear()
+    return stamp
+
+
+def get_index():
+    """Return this worker's BM25 index, rebuilding it when the catalog changed."""
+    global _index, _index_built_for
+    stamp = current_stamp()
+    if _index is None or _index_built_for != stamp:
+        with _lock:
+            if _index is None or _index_built_for != stamp:
+                _index = BM25Index(Movie.objects.values("id", "title", "director", "description"))
+                _index_built_for = stamp
+    return _index
+
+
+def _uses_postgres():
+    return connection.vendor == "postgresql"
+
+
+def _postgres_rankings(query, limit=CANDIDATES):
+    """
+    Full-text and trigram rankings served by the GIN indexes from migration
+    0009: the weighted `search_vector` column, and title trigrams for
+    partial words and typos.
+    """
+    vector = RawSQL(f'"{Movie._meta.db_table}"."search_vector"', [], output_field=SearchVectorField())
+    search_query = SearchQuery(query, search_type="websearch", config="english")
+    full_text = (
+        Movie.objects.annotate(document=vector)
+        .filter(document=search_query)
+        .annotate(rank=SearchRank(vector, search_query))
+        .order_by("-rank", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    trigram = (
+        Movie.objects.filter(title__trigram_word_similar=query)
+        .annotate(similarity=TrigramWordSimilarity(query, "title"))
+        .order_by("-similarity", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    return [list(full_text), list(trigram)]
+
+
+def lexical_rankings(query):
+    """Database full-text search on Postgres, the in-process BM25 index elsewhere (SQLite)."""
+    if _uses_postgres():
+        return _postgres_rankings(query)
+    return [get_index().search(query)]
+
+
+def _vector_ranking(query, limit=VECTOR_CANDIDATES):
+    """Movie ids ranked by embedding similarity, or [] when no embedding is available."""
+    if not GOOGLE_API_KEY:
+        return []
+    try:
+        query_vector = get_embeddings_model().embed_query(query)
+        results = get_vector_store().query([query_vector], n_results=limit)
+    except Exception as e:
+        logger.warning("Vector search unavailable, using lexical results only", extra={"error": str(e)})
+        return []
+
+    ranked = []
+    seen = set()
+    for meta, distance in zip((results["metadatas"] or [[]])[0], (results["distances"] or [[]])[0]):
+        if distance > VECTOR_MAX_DISTANCE:
+            # Results come nearest first
+            break
+        movie_id = int(meta.get("movie_id"))
+        if movie_id not in seen:
+            seen.add(movie_id)
+            ranked.append(movie_id)
+    return ranked
+
+
+def reciprocal_rank_fusion(*rankings, k=RRF_K):
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, movie_id in enumerate(ranking, start=1):
+            scores[movie_id] += 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def hybrid_search(query):
+    """
+    Return movie ids for `query`, best first.
+
+    Lexical hits (see `lexical_rankings`) and vector-similarity hits are
+    merged with reciprocal rank fusion. Results are cached per worker by
+    normalized query.
+    """
+    query = " ".join(query.lower().split())
+    if not query:
+        return []
+    key = (query, current_stamp())
+    now = time.monotonic()
+    with _lock:
+        cached = _results.get(key)
+        if cached is not None and now - cached[1] < RESULT_CACHE_TTL:
+            _results.move_to_end(key)
+            _result_stats["hits"] += 1
+            return cached[0]
+        _result_stats["misses"] += 1
+
+    # Without an embedding (no API key, API down) this is pure lexical search
+    ranked = reciprocal_rank_fusion(*lexical_rankings(query), _vector_ranking(query))
+
+    with _lock:
+        _results[key] = (ranked, now)
+        _results.move_to_end(key)
+        while len(_results) > RESULT_CACHE_SIZE:
+            _results.popitem(last=False)
+    return ranked
+
+
+def result_cache_stats():
+    """Hit/miss counters of this worker's search result cache."""
+    with _lock:
+        lookups = _result_stats["hits"] + _result_stats["misses"]
+        return {
+            **_result_stats,
+            "hit_ratio": _result_stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(_results),
+        }
+
+
+def movies_in_order(movie_ids):
+    """Load Movie objects for `movie_ids`, keeping the given order."""
+    by_id = Movie.objects.in_bulk(movie_ids)
+    return [by_id[i] for i in movie_ids if i in by_id]
@@ -0,0 +1,35 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from genres.models import Genre
+from .autocomplete import titles
+from .catalog import bump_version
+from .models import Movie, WatchedMovie
+from .rankings import WATCH_WEIGHT
+from .tasks import queue_taste_update, record_movie_activity
+
+
+@receiver(post_save, sender=WatchedMovie)
+def watched_movie_saved(sender, instance, created, **kwargs):
+    if created:
+        record_movie_activity.enqueue(instance.movie_id, WATCH_WEIGHT, when=instance.watched_at, watch_delta=1)
+        queue_taste_update(instance.user_id, [instance.movie_id])
+
+
+@receiver(post_delete, sender=WatchedMovie)
+def watched_movie_deleted(sender, instance, **kwargs):
+    # Trending activity already counted simply decays away
+    record_movie_activity.enqueue(instance.movie_id, 0.0, watch_delta=-1)
+    queue_taste_update(instance.user_id, [instance.movie_id])
+
+
+# Rebuild this worker's title autocomplete index on its next lookup
+post_save.connect(titles.invalidate, sender=Movie, dispatch_uid='movies_titles_autocomplete_save')
+post_delete.connect(titles.invalidate, sender=Movie, dispatch_uid='movies_titles_autocomplete_delete')
+
+# Tell every worker to reload its catalog snapshot
+post_save.connect(bump_version, sender=Movie, dispatch_uid='movies_catalog_save')
+post_delete.connect(bump_version, sender=Movie, dispatch_uid='movies_catalog_delete')
+m2m_changed.connect(bump_version, sender=Movie.genres.through, dispatch_uid='movies_catalog_genres')
+post_save.connect(bump_version, sender=Genre, dispatch_uid='movies_catalog_genre_save')
+post_delete.connect(bump_version, sender=Genre, dispatch_uid='movies_catalog_genre_delete')
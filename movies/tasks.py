@@ -0,0 +1,43 @@
+from django.utils.dateparse import parse_datetime
+
+from jobs.queue import task
+from .models import Movie
+from .rankings import record_activity, update_popularity
+from .ratings import apply_rating_change
+from .taste import rebuild_taste, update_taste
+
+
+@task(max_attempts=5)
+def apply_review_change(movie_id, added=None, removed=None):
+    """Fold a review write into the movie's rating counters, then its popularity."""
+    if not Movie.objects.filter(pk=movie_id).exists():
+        # Deleted since; its counters went with it
+        return
+    apply_rating_change(movie_id, added=added, removed=removed)
+    update_popularity(movie_id)
+
+
+@task()
+def record_movie_activity(movie_id, weight, when=None, watch_delta=0):
+    record_activity(movie_id, weight, when=parse_datetime(when) if when else None, watch_delta=watch_delta)
+
+
+@task()
+def update_user_taste(user_id, movie_id):
+    update_taste(user_id, [movie_id])
+
+
+def queue_taste_update(user_id, movie_ids):
+    """
+    Queue taste updates for the movies a watch or review write touched.
+
+    Runs no queries: the job works the weights out from the current rows,
+    so one queued job per (user, movie) covers any number of writes.
+    """
+    for movie_id in set(movie_ids) - {None}:
+        update_user_taste.enqueue(user_id, movie_id, dedup_key=f"taste-update:{user_id}:{movie_id}")
+
+
+@task()
+def rebuild_user_taste(user_id):
+    rebuild_taste(user_id)
@@ -0,0 +1,196 @@
+"""
+Per-user taste vectors and the homepage "For you" row.
+
+A user's taste is the rating-weighted mean of the stored embeddings of the
+movies they watched or reviewed (a review weighs rating / 5, a plain watch
+1, as in movies.collaborative). UserTaste keeps the running sum and
+UserTasteWeight the weight each movie is counted with, so a watch or review
+only queues a job for that (user, movie) pair, which moves the sum by the
+difference between the movie's current weight and its counted one. Nothing
+is embedded at request time and no LLM is involved.
+
+"For you" is one vector-store query with the taste vector that filters
+out the user's watched movies, cached per worker until the taste changes.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from movies.collaborative import interaction_weight, load_histories
+from movies.models import UserTaste, UserTasteWeight, WatchedMovie
+from movies.vector.stores import get_vector_store
+from reviews.models import Review
+
+FOR_YOU_CACHE_SIZE = getattr(settings, "FOR_YOU_CACHE_SIZE", 1024)
+FOR_YOU_CACHE_TTL = getattr(settings, "FOR_YOU_CACHE_TTL", 600)
+
+# Embeddings fetched from the vector store per call when rebuilding a taste
+EMBEDDING_BATCH = 500
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_results = OrderedDict()  # (user_id, updated_at, limit) -> (movie ids, created)
+
+
+def pair_weight(user_id, movie_id):
+    """What `movie_id` currently adds to the user's taste (0 when neither watched nor reviewed)."""
+    rating = (
+        Review.objects.filter(user_id=user_id, movie_id=movie_id)
+        .order_by("-date").values_list("rating", flat=True).first()
+    )
+    if rating is not None:
+        return interaction_weight(rating)
+    return interaction_weight() if WatchedMovie.objects.filter(user_id=user_id, movie_id=movie_id).exists() else 0.0
+
+
+def _add(vector_sum, contribution):
+    return contribution if vector_sum is None else vector_sum + contribution
+
+
+def update_taste(user_id, movie_ids):
+    """
+    Bring the share of `movie_ids` in the user's UserTaste in line with
+    their current watches and reviews.
+
+    The difference is taken against the stored UserTasteWeight, not passed
+    in, so running this twice, out of order or after a rebuild that already
+    saw the write changes nothing more. Users whose taste is not built for
+    the current store are left alone (and so are deleted users, whose rows
+    are already gone); the rebuild their next read queues covers them.
+    Vector store errors propagate so the job is retried.
+    """
+    store = get_vector_store()
+    version = store.version()
+    # Most writers have no built taste: skip the vector store round trip for them
+    if not UserTaste.objects.filter(user_id=user_id, store_version=version).exists():
+        return
+    embeddings = store.embeddings(list(movie_ids))
+    with transaction.atomic():
+        # Taken by rebuild_taste too, so the weights read below are settled
+        taste = UserTaste.objects.select_for_update().filter(user_id=user_id).first()
+        if taste is None or taste.store_version != version:
+            return
+        counted = dict(
+            UserTasteWeight.objects.filter(user_id=user_id, movie_id__in=movie_ids).values_list("movie_id", "weight")
+        )
+        vector_sum = np.frombuffer(taste.vector_sum, dtype=np.float32).copy() if taste.vector_sum else None
+        changed = False
+        for movie_id in movie_ids:
+            embedding = embeddings.get(movie_id)
+            if embedding is None:
+                # Not in the store, so never counted either
+                continue
+            old, new = counted.get(movie_id, 0.0), pair_weight(user_id, movie_id)
+            if new == old:
+                continue
+            vector_sum = _add(vector_sum, (new - old) * embedding)
+            taste.weight_sum += new - old
+            changed = True
+            if new:
+                UserTasteWeight.objects.update_or_create(user_id=user_id, movie_id=movie_id, defaults={"weight": new})
+            else:
+                UserTasteWeight.objects.filter(user_id=user_id, movie_id=movie_id).delete()
+        if changed:
+            taste.vector_sum = vector_sum.astype(np.float32).tobytes()
+            taste.save()
+
+
+def rebuild_taste(user_id):
+    """Recompute a user's UserTaste and its weights from their whole history; returns it."""
+    store = get_vector_store()
+    version = store.version()
+    with transaction.atomic():
+        # Updates queued meanwhile wait here, then diff against the new weights
+        UserTaste.objects.select_for_update().filter(user_id=user_id).first()
+        history = load_histories(max_history=None, user_ids=[user_id]).get(user_id, [])
+        vector_sum, weight_sum, counted = None, 0.0, []
+        for start in range(0, len(history), EMBEDDING_BATCH):
+            batch = dict(history[start:start + EMBEDDING_BATCH])
+            for movie_id, embedding in store.embeddings(list(batch)).items():
+                vector_sum = _add(vector_sum, batch[movie_id] * embedding)
+                weight_sum += batch[movie_id]
+                counted.append(UserTasteWeight(user_id=user_id, movie_id=movie_id, weight=batch[movie_id]))
+        # A user without history keeps an empty row, so reads stop queueing rebuilds
+        taste, _ = UserTaste.objects.update_or_create(
+            user_id=user_id,
+            defaults={"vector_sum": b"" if vector_sum is None else vector_sum.astype(np.float32).tobytes(),
+                      "weight_sum": weight_sum, "store_version": version},
+        )
+        UserTasteWeight.objects.filter(user_id=user_id).delete()
+        UserTasteWeight.objects.bulk_create(counted, batch_size=EMBEDDING_BATCH)
+    return taste
+
+
+def get_taste(user):
+    """
+    The user's UserTaste (an empty placeholder before it was first built).
+
+    Building reads the user's whole history from the vector store, which is
+    too slow for the homepage: a new row, or one left from before a
+    re-ingest, queues a rebuild job and the caller makes do with what there
+    is (a stale taste still points the right way; the embedding model is
+    the same). The placeholder is written first so that update jobs racing
+    the rebuild queue up behind its row lock instead of finding no row.
+    """
+    taste, _ = UserTaste.objects.get_or_create(user=user, defaults={"vector_sum": b""})
+    if taste.store_version != get_vector_store().version():
+        from movies.tasks import rebuild_user_taste  # movies.tasks imports this module
+        rebuild_user_taste.enqueue(user.pk, dedup_key=f"taste-rebuild:{user.pk}")
+    return taste
+
+
+def taste_vector(taste):
+    if taste is None or taste.weight_sum <= 0:
+        return None
+    return np.frombuffer(taste.vector_sum, dtype=np.float32) / taste.weight_sum
+
+
+def for_you(user, limit=7):
+    """Movie ids closest to the user's taste that they have not watched yet, best first."""
+    try:
+        taste = get_taste(user)
+    except Exception as e:
+        logger.warning("For you unavailable", extra={"error": str(e)})
+        return []
+    vector = taste_vector(taste)
+    if vector is None:
+        return []
+
+    key = (user.pk, taste.updated_at, limit)
+    now = time.monotonic()
+    with _lock:
+        cached = _results.get(key)
+        if cached is not None and now - cached[1] < FOR_YOU_CACHE_TTL:
+            _results.move_to_end(key)
+            return cached[0]
+
+    watched = list(WatchedMovie.objects.filter(user=user).values_list("movie_id", flat=True))
+    # Movies have several chunks: over-fetch and keep the first hit per movie
+    try:
+        results = get_vector_store().query(
+            [vector.tolist()], n_results=limit * 3,
+            where={"movie_id": {"$nin": watched}} if watched else None,
+        )
+    except Exception as e:
+        logger.warning("For you unavailable", extra={"error": str(e)})
+        return []
+    movie_ids = []
+    for meta in results["metadatas"][0]:
+        movie_id = int(meta["movie_id"])
+        if movie_id not in movie_ids:
+            movie_ids.append(movie_id)
+            if len(movie_ids) >= limit:
+                break
+
+    with _lock:
+        _results[key] = (movie_ids, now)
+        _results.move_to_end(key)
+        while len(_results) > FOR_YOU_CACHE_SIZE:
+            _results.popitem(last=False)
+    return movie_ids
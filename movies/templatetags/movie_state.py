@@ -0,0 +1,27 @@
+from django import template
+
+from movies.overlay import empty_state, movie_states as load_movie_states
+
+register = template.Library()
+
+
+def _movie_id(movie):
+    return movie["id"] if isinstance(movie, dict) else movie.id
+
+
+@register.simple_tag(takes_context=True)
+def movie_states(context, movies):
+    """
+    Batch-load the user's state for every movie in a grid:
+    {% movie_states page_obj as states %}
+    """
+    request = context.get("request")
+    if request is None or not request.user.is_authenticated:
+        return {}
+    return load_movie_states(request, [_movie_id(movie) for movie in movies])
+
+
+@register.inclusion_tag("partials/_movie_state.html")
+def movie_badges(states, movie):
+    """Watched / watchlist / rating badges for one card: {% movie_badges states movie %}"""
+    return {"state": states.get(_movie_id(movie), empty_state()) if states else None}
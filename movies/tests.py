@@ -1,3 +1,28 @@
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Movie
+from .tasks import apply_review_change
+
+
+class ReviewChangeOrderTests(TestCase):
+    def setUp(self):
+        self.movie = Movie.objects.create(title='Heat', year=1995, director='Michael Mann', description='')
+
+    def assertCounters(self, rating_sum, rating_count, rating, histogram):
+        self.movie.refresh_from_db()
+        self.assertEqual((self.movie.rating_sum, self.movie.rating_count), (rating_sum, rating_count))
+        self.assertEqual(self.movie.rating, rating)
+        self.assertEqual(self.movie.rating_histogram(), histogram)
+
+    def test_create_edit_delete_in_reverse_order(self):
+        # One review: created with 8, edited to 6, then deleted; the jobs run last to first
+        changes = [{'added': 8}, {'added': 6, 'removed': 8}, {'removed': 6}]
+        for change in reversed(changes):
+            apply_review_change(self.movie.pk, **change)
+        self.assertCounters(0, 0, 0.0, [0] * 10)
+
+    def test_out_of_order_changes_keep_other_reviews(self):
+        apply_review_change(self.movie.pk, added=4)
+        for change in reversed([{'added': 9}, {'added': 7, 'removed': 9}]):
+            apply_review_change(self.movie.pk, **change)
+        self.assertCounters(11, 2, 5.5, [0, 0, 0, 1, 0, 0, 1, 0, 0, 0])
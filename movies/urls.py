@@ -13,4 +13,8 @@ urlpatterns = [
     path('movie/<int:movie_id>/watched/', views.toggle_watched, name='toggle_watched'),
     path("my-films/", views.my_films, name="my_films"),
     path('api/recommend/', views.recommend_movie_api, name='recommend_api'),
+    path('api/recommend/stream/', views.recommend_movie_stream_api, name='recommend_stream_api'),
+    path('api/recommend/cache-stats/', views.recommend_cache_stats, name='recommend_cache_stats'),
+    path('api/autocomplete/titles/', views.title_autocomplete, name='title_autocomplete'),
+    path('api/movie-states/', views.movie_states_api, name='movie_states_api'),
 ]
@@ -1,52 +1,29 @@
-import os
 import json
-import chromadb
-from django.conf import settings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+import logging
+import time
 from langchain_core.prompts import PromptTemplate
 
-CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", os.path.join(settings.BASE_DIR, "chroma_db"))
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+from filmmate.metrics import span
 
-def get_recommendation(user_query):
-    """
-    Функция за чатбота: приема въпрос от потребителя,
-    намира контекст от базата и връща отговор + препоръки чрез LLM.
-    """
-    if not GOOGLE_API_KEY: 
-        return {"text_response": "API Key Error", "recommendations": []}
+from .clients import (
+    CHROMA_DIR,
+    GOOGLE_API_KEY,
+    get_embeddings_model,
+    get_llm,
+)
+from .semantic_cache import get_semantic_cache
+from .stores import get_vector_store
+from .versions import content_version
 
-    try:
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        collection = client.get_or_create_collection("movies_collection")
-        
-        embeddings_model = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004", 
-            google_api_key=GOOGLE_API_KEY
-        )
-        
-        query_vector = embeddings_model.embed_query(user_query)
-        results = collection.query(query_embeddings=[query_vector], n_results=10)
-
-        context_text = ""
-        if results['documents'] and results['documents'][0]:
-            for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
-                context_text += f"""
-                Title: {meta.get('title')} (Year: {meta.get('year')})
-                Genre: {meta.get('genre')}
-                Poster: {meta.get('poster_url')}
-                Link: {meta.get('detail_link')}
-                Plot: {doc}
-                \n---\n
-                """
-
-        llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash", 
-            google_api_key=GOOGLE_API_KEY, 
-            temperature=0.7
-        )
-        
-        template = """
+logger = logging.getLogger(__name__)
+
+
+def _query_collection(query_vector, n_results, create=False):
+    """Query the configured vector store (Chroma or the NumPy index) with one vector."""
+    return get_vector_store().query([query_vector], n_results=n_results, create=create)
+
+
+RECOMMENDATION_TEMPLATE = """
         You are 'FilmMate', a helpful movie assistant.
         User Input: {question}
         
@@ -74,22 +51,206 @@ def get_recommendation(user_query):
             ]
         }}
         """
-        
-        prompt = PromptTemplate.from_template(template)
-        chain = prompt | llm
-        response = chain.invoke({"question": user_query, "context": context_text})
-        
-        content = response.content.strip()
-        if content.startswith("```json"): content = content[7:]
-        if content.endswith("```"): content = content[:-3]
-        
-        return json.loads(content)
 
-    except Exception as e:
-        print(f"Error in chatbot recommendation: {e}")
+
+def retrieve_context(user_query, n_results=10, query_vector=None):
+    """
+    Намира най-близките до въпроса филми във векторната база.
+
+    Returns:
+        tuple: (candidates, context_text) - списък с речници за филмите
+        и текстовият контекст, който се подава на LLM-а.
+    """
+    if query_vector is None:
+        query_vector = get_embeddings_model().embed_query(user_query)
+    results = _query_collection(query_vector, n_results=n_results, create=True)
+
+    candidates = []
+    context_text = ""
+    if results['documents'] and results['documents'][0]:
+        for doc, meta in zip(results['documents'][0], results['metadatas'][0]):
+            candidates.append({
+                'movie_id': meta.get('movie_id'),
+                'title': meta.get('title'),
+                'year': meta.get('year'),
+                'genre': meta.get('genre'),
+                'poster_url': meta.get('poster_url'),
+                'detail_link': meta.get('detail_link'),
+            })
+            context_text += f"""
+            Title: {meta.get('title')} (Year: {meta.get('year')})
+            Genre: {meta.get('genre')}
+            Poster: {meta.get('poster_url')}
+            Link: {meta.get('detail_link')}
+            Plot: {doc}
+            \n---\n
+            """
+    return candidates, context_text
+
+
+def _recommendation_chain():
+    return PromptTemplate.from_template(RECOMMENDATION_TEMPLATE) | get_llm()
+
+
+def parse_llm_json(content):
+    """Маха markdown оградите около JSON отговора на модела и го парсва."""
+    content = content.strip()
+    if content.startswith("```json"): content = content[7:]
+    if content.endswith("```"): content = content[:-3]
+    return json.loads(content)
+
+
+def _lookup_cached_answer(user_query):
+    """
+    Embed the query and check the semantic cache.
+
+    Returns:
+        tuple: (query_vector, content_version, cached_entry_or_None)
+    """
+    query_vector = get_embeddings_model().embed_query(user_query)
+    version = content_version()
+    return query_vector, version, get_semantic_cache().lookup(query_vector, version)
+
+
+def get_recommendation(user_query):
+    """
+    Функция за чатбота: приема въпрос от потребителя,
+    намира контекст от базата и връща отговор + препоръки чрез LLM.
+    """
+    if not GOOGLE_API_KEY: 
+        return {"text_response": "API Key Error", "recommendations": []}
+
+    try:
+        query_vector, version, cached = _lookup_cached_answer(user_query)
+        if cached is not None:
+            return cached["response"]
+
+        started = time.perf_counter()
+        candidates, context_text = retrieve_context(user_query, query_vector=query_vector)
+
+        chain = _recommendation_chain()
+        with span("llm"):
+            response = chain.invoke({"question": user_query, "context": context_text})
+
+        result = parse_llm_json(response.content)
+        get_semantic_cache().store(query_vector, version, candidates, result, time.perf_counter() - started)
+        return result
+
+    except Exception:
+        logger.exception("Chatbot recommendation failed")
         return {"text_response": "I'm having trouble accessing my movie database right now.", "recommendations": []}
 
 
+class TextResponseExtractor:
+    """
+    Incrementally pulls the value of "text_response" out of the JSON the
+    model is still generating, so only the human-readable answer is streamed.
+    """
+
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = None  # index of the next unread character of the value
+        self.done = False
+
+    def feed(self, chunk):
+        """Add a raw model chunk and return the newly decoded answer text."""
+        self.buffer += chunk
+        if self.done:
+            return ""
+        if self.pos is None:
+            key = self.buffer.find('"text_response"')
+            if key == -1:
+                return ""
+            colon = self.buffer.find(':', key + len('"text_response"'))
+            quote = self.buffer.find('"', colon + 1) if colon != -1 else -1
+            if quote == -1:
+                return ""
+            self.pos = quote + 1
+
+        out = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if ch == '"':
+                self.done = True
+                break
+            if ch == '\\':
+                # Wait for the whole escape sequence before decoding it
+                if self.pos + 1 >= len(self.buffer):
+                    break
+                esc = self.buffer[self.pos + 1]
+                if esc == 'u':
+                    if self.pos + 6 > len(self.buffer):
+                        break
+                    code = int(self.buffer[self.pos + 2:self.pos + 6], 16)
+                    if 0xD800 <= code < 0xDC00:
+                        # Surrogate pair (e.g. an escaped emoji): needs the second half too
+                        if self.pos + 12 > len(self.buffer):
+                            break
+                        low = int(self.buffer[self.pos + 8:self.pos + 12], 16)
+                        code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                        self.pos += 6
+                    out.append(chr(code))
+                    self.pos += 6
+                else:
+                    out.append(self._ESCAPES.get(esc, esc))
+                    self.pos += 2
+                continue
+            out.append(ch)
+            self.pos += 1
+        return "".join(out)
+
+
+async def astream_recommendation(user_query):
+    """
+    Async версия на get_recommendation за SSE стрийминг.
+
+    Yields (event, data) tuples: first ("candidates", [...]) with the
+    retrieved movies, then ("token", text) pieces of the answer as the model
+    generates them, and finally ("done", {...}) with the parsed JSON.
+    """
+    from asgiref.sync import sync_to_async
+
+    if not GOOGLE_API_KEY:
+        yield "done", {"text_response": "API Key Error", "recommendations": []}
+        return
+
+    try:
+        # These touch the ORM: run them on the request's sync thread (the default),
+        # whose DB connection Django closes when the request finishes
+        query_vector, version, cached = await sync_to_async(_lookup_cached_answer)(user_query)
+        if cached is not None:
+            yield "candidates", cached["candidates"]
+            yield "token", cached["response"].get("text_response", "")
+            yield "done", cached["response"]
+            return
+
+        started = time.perf_counter()
+        candidates, context_text = await sync_to_async(retrieve_context)(
+            user_query, query_vector=query_vector
+        )
+        yield "candidates", candidates
+
+        extractor = TextResponseExtractor()
+        content = ""
+        # Includes the time the client takes to read the streamed tokens
+        with span("llm"):
+            async for chunk in _recommendation_chain().astream({"question": user_query, "context": context_text}):
+                content += chunk.content
+                text = extractor.feed(chunk.content)
+                if text:
+                    yield "token", text
+
+        result = parse_llm_json(content)
+        get_semantic_cache().store(query_vector, version, candidates, result, time.perf_counter() - started)
+        yield "done", result
+
+    except Exception:
+        logger.exception("Streaming chatbot recommendation failed")
+        yield "done", {"text_response": "I'm having trouble accessing my movie database right now.", "recommendations": []}
+
+
 def find_similar_movies_by_content(movie_text, current_movie_id, top_k=4):
     """
     Търси подобни филми на база векторно съвпадение (semantically similar).
@@ -103,24 +264,13 @@ def find_similar_movies_by_content(movie_text, current_movie_id, top_k=4):
         list: Списък с речници {'id', 'title', 'year', 'poster'}.
     """
     if not GOOGLE_API_KEY: 
-        print("Google API Key is missing.")
+        logger.warning("Google API Key is missing.")
         return []
 
     try:
-        client = chromadb.PersistentClient(path=CHROMA_DIR)
-        collection = client.get_collection("movies_collection")
-        
-        embeddings_model = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004", 
-            google_api_key=GOOGLE_API_KEY
-        )
+        query_vector = get_embeddings_model().embed_query(movie_text)
 
-        query_vector = embeddings_model.embed_query(movie_text)
-
-        results = collection.query(
-            query_embeddings=[query_vector], 
-            n_results=20 
-        )
+        results = _query_collection(query_vector, n_results=20)
 
         similar_movies = []
         seen_ids = set()
@@ -149,6 +299,6 @@ def find_similar_movies_by_content(movie_text, current_movie_id, top_k=4):
         
         return similar_movies
 
-    except Exception as e:
-        print(f"Error in finding similar movies: {e}")
+    except Exception:
+        logger.exception("Finding similar movies failed", extra={"movie_id": current_movie_id})
         return []
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import threading
+
+import chromadb
+from django.conf import settings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+
+from .embedding_cache import CachedEmbeddings, get_embedding_cache
+
+CHROMA_DIR = os.getenv("CHROMA_PERSIST_DIR", os.path.join(settings.BASE_DIR, "chroma_db"))
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+COLLECTION_NAME = "movies_collection"
+EMBEDDING_MODEL = "models/text-embedding-004"
+CHAT_MODEL = "gemini-2.5-flash"
+CHAT_TEMPERATURE = 0.7
+
+# Per-process (per-worker) client pool. Everything is created lazily on first
+# use and then shared by every request thread served by this worker.
+_lock = threading.RLock()
+_chroma_client = None
+_embeddings_model = None
+_llm = None
+_collections = {}
+
+
+def get_chroma_client():
+    """Return the shared PersistentClient, opening the on-disk store once."""
+    global _chroma_client
+    if _chroma_client is None:
+        with _lock:
+            if _chroma_client is None:
+                _chroma_client = chromadb.PersistentClient(path=CHROMA_DIR)
+    return _chroma_client
+
+
+def get_collection(name=COLLECTION_NAME, create=False):
+    """
+    Return a warm collection handle.
+
+    Args:
+        name (str): Collection name.
+        create (bool): Create the collection if it does not exist yet.
+    """
+    collection = _collections.get(name)
+    if collection is None:
+        with _lock:
+            collection = _collections.get(name)
+            if collection is None:
+                client = get_chroma_client()
+                if create:
+                    collection = client.get_or_create_collection(name)
+                else:
+                    collection = client.get_collection(name)
+                _collections[name] = collection
+    return collection
+
+
+def get_embeddings_model():
+    """Return the shared Google embeddings client, fronted by the embedding cache."""
+    global _embeddings_model
+    if _embeddings_model is None:
+        with _lock:
+            if _embeddings_model is None:
+                _embeddings_model = CachedEmbeddings(
+                    GoogleGenerativeAIEmbeddings(
+                        model=EMBEDDING_MODEL,
+                        google_api_key=GOOGLE_API_KEY
+                    ),
+                    model_name=EMBEDDING_MODEL,
+                    cache=get_embedding_cache(),
+                )
+    return _embeddings_model
+
+
+def get_llm():
+    """Return the shared Gemini chat client used by the chatbot."""
+    global _llm
+    if _llm is None:
+        with _lock:
+            if _llm is None:
+                _llm = ChatGoogleGenerativeAI(
+                    model=CHAT_MODEL,
+                    google_api_key=GOOGLE_API_KEY,
+                    temperature=CHAT_TEMPERATURE
+                )
+    return _llm
+
+
+def reset_collections():
+    """Drop cached collection handles (e.g. after a collection was recreated)."""
+    with _lock:
+        _collections.clear()
+
+
+def reset_clients():
+    """Drop every pooled client so the next call reopens the store from scratch."""
+    global _chroma_client, _embeddings_model, _llm
+    with _lock:
+        _collections.clear()
+        _chroma_client = None
+        _embeddings_model = None
+        _llm = None
@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+
+from filmmate.metrics import span
+
+logger = logging.getLogger(__name__)
+
+MEMORY_SIZE = getattr(settings, "EMBEDDING_CACHE_MEMORY_SIZE", 2048)
+DISK_MAX_ROWS = getattr(settings, "EMBEDDING_CACHE_MAX_ROWS", 50000)
+DISK_PATH = getattr(
+    settings, "EMBEDDING_CACHE_PATH",
+    os.path.join(settings.BASE_DIR, "embedding_cache.sqlite3")
+)
+
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different strings share one entry."""
+    return " ".join((text or "").split())
+
+
+def cache_key(model_name, text):
+    """Content address of an embedding: model name + SHA-256 of the normalized text."""
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model_name}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache.
+
+    The first tier is an in-process LRU dict; the second is a SQLite file
+    shared by every worker and by the ingest command. The SQLite tier is
+    bounded to `disk_max_rows`, evicting the least recently used rows.
+    """
+
+    def __init__(self, path=DISK_PATH, memory_size=MEMORY_SIZE, disk_max_rows=DISK_MAX_ROWS):
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_max_rows = disk_max_rows
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # --- SQLite tier ---
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get_many(self, keys):
+        if not keys:
+            return {}
+        try:
+            conn = self._connection()
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+            ).fetchall()
+            if rows:
+                with conn:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                        [(time.time(), key) for key, _ in rows]
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache read failed", extra={"error": str(e)})
+            return {}
+        return {key: array("f", blob).tolist() for key, blob in rows}
+
+    def _disk_put_many(self, items):
+        if not items:
+            return
+        try:
+            conn = self._connection()
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    [(key, array("f", vector).tobytes(), now) for key, vector in items.items()]
+                )
+                (count,) = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+                if count > self.disk_max_rows:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE key IN ("
+                        " SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (count - self.disk_max_rows,)
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Embedding cache write failed", extra={"error": str(e)})
+
+    # --- Memory tier ---
+
+    def _memory_get(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+            return vector
+
+    def _memory_put(self, key, vector):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    # --- Public API ---
+
+    def get_many(self, keys):
+        """Return {key: vector} for every key found in either tier."""
+        found = {}
+        missing = []
+        for key in keys:
+            vector = self._memory_get(key)
+            if vector is not None:
+                found[key] = vector
+            else:
+                missing.append(key)
+
+        from_disk = self._disk_get_many(missing)
+        for key, vector in from_disk.items():
+            self._memory_put(key, vector)
+            found[key] = vector
+
+        with self._lock:
+            self.memory_hits += len(keys) - len(missing)
+            self.disk_hits += len(from_disk)
+            self.misses += len(missing) - len(from_disk)
+        return found
+
+    def put_many(self, items):
+        """Store {key: vector} in both tiers."""
+        for key, vector in items.items():
+            self._memory_put(key, vector)
+        self._disk_put_many(items)
+
+    def stats(self):
+        """Hit/miss counters for this process."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+
+class CachedEmbeddings:
+    """
+    Wraps a LangChain embeddings client with the same `embed_query` /
+    `embed_documents` interface, serving repeated texts from the cache.
+
+    Query and document embeddings use different task types on the Google
+    API, so they are cached under separate keys.
+    """
+
+    def __init__(self, embeddings_model, model_name, cache):
+        self.embeddings_model = embeddings_model
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_query(self, text):
+        key = cache_key(f"{self.model_name}:query", text)
+        vector = self.cache.get_many([key]).get(key)
+        if vector is None:
+            with span("embed"):
+                vector = self.embeddings_model.embed_query(text)
+            self.cache.put_many({key: vector})
+        return vector
+
+    def embed_documents(self, texts):
+        keys = [cache_key(f"{self.model_name}:document", t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            with span("embed"):
+                vectors = self.embeddings_model.embed_documents(list(missing.values()))
+            new_items = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(new_items)
+            found.update(new_items)
+
+        return [found[key] for key in keys]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Return this worker's shared EmbeddingCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = EmbeddingCache()
+    return _cache
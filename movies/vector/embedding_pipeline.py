@@ -0,0 +1,140 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Provider limits for text-embedding-004: at most 100 texts per batch request.
+# The character budget keeps a single request well under the payload limit.
+MAX_BATCH_ITEMS = 100
+MAX_BATCH_CHARS = 60000
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedEmbeddings:
+    """
+    Wraps a raw embeddings client so every API call takes a token from the
+    bucket and is retried with exponential backoff and full jitter.
+
+    Put it *under* the embedding cache so cache hits cost no tokens.
+    """
+
+    def __init__(self, embeddings_model, bucket, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.embeddings_model = embeddings_model
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _call(self, fn, *args):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                return fn(*args)
+            except Exception:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+                time.sleep(random.uniform(0, delay))
+
+    def embed_query(self, text):
+        return self._call(self.embeddings_model.embed_query, text)
+
+    def embed_documents(self, texts):
+        return self._call(self.embeddings_model.embed_documents, texts)
+
+
+def make_batches(ids, docs, metadatas, max_items=MAX_BATCH_ITEMS, max_chars=MAX_BATCH_CHARS):
+    """Group chunks into batches that respect the provider's item and size limits."""
+    batches = []
+    current = {"ids": [], "documents": [], "metadatas": []}
+    chars = 0
+    for chunk_id, doc, meta in zip(ids, docs, metadatas):
+        if current["ids"] and (len(current["ids"]) >= max_items or chars + len(doc) > max_chars):
+            batches.append(current)
+            current = {"ids": [], "documents": [], "metadatas": []}
+            chars = 0
+        current["ids"].append(chunk_id)
+        current["documents"].append(doc)
+        current["metadatas"].append(meta)
+        chars += len(doc)
+    if current["ids"]:
+        batches.append(current)
+    return batches
+
+
+def load_retry_file(path):
+    """Read the batches a previous run could not embed."""
+    batches = []
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batches.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return batches
+
+
+def write_retry_file(path, batches):
+    """Overwrite the retry file with `batches` (removes it when there are none)."""
+    if not batches:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        for batch in batches:
+            f.write(json.dumps(batch) + "\n")
+
+
+def run_pipeline(batches, embeddings_model, write, workers=4, log=print):
+    """
+    Embed `batches` on a pool of worker threads and hand each finished batch
+    to `write(batch, embeddings)` on the calling thread, so vector-store
+    writes overlap with the embedding calls still in flight.
+
+    Returns (written_chunks, failed_batches).
+    """
+    written = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(embeddings_model.embed_documents, batch["documents"]): batch
+            for batch in batches
+        }
+        for n, future in enumerate(as_completed(futures), start=1):
+            batch = futures[future]
+            try:
+                write(batch, future.result())
+                written += len(batch["ids"])
+                log(f"   [{n}/{len(batches)}] stored {len(batch['ids'])} chunks")
+            except Exception as e:
+                failed.append(batch)
+                log(f"❌ Batch {batch['ids'][0]}.. failed: {e}")
+    return written, failed
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+THRESHOLD = getattr(settings, "SEMANTIC_CACHE_THRESHOLD", 0.92)
+TTL_SECONDS = getattr(settings, "SEMANTIC_CACHE_TTL", 3600)
+MAX_ENTRIES = getattr(settings, "SEMANTIC_CACHE_MAX_ENTRIES", 512)
+
+
+class SemanticCache:
+    """
+    Caches chatbot answers by query meaning instead of exact text.
+
+    A new query is served from the cache when the cosine similarity of its
+    embedding to a stored query is at least `threshold`. Entries expire after
+    `ttl` seconds, the cache holds at most `max_entries` (least recently used
+    are evicted), and everything is dropped when the content version the
+    answers were retrieved from changes (a new collection, or an in-place
+    incremental ingest; see movies.vector.versions.content_version).
+    """
+
+    def __init__(self, threshold=THRESHOLD, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> dict(vector, movie_ids, candidates, response, latency, created)
+        self._next_key = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def lookup(self, query_vector, version):
+        """Return the cached entry closest to `query_vector`, or None."""
+        query = self._normalize(query_vector)
+        now = time.time()
+        with self._lock:
+            self._check_version(version)
+            for key in [k for k, e in self._entries.items() if now - e["created"] > self.ttl]:
+                del self._entries[key]
+
+            best_key, best_score = None, self.threshold
+            if self._entries:
+                keys = list(self._entries)
+                matrix = np.stack([self._entries[k]["vector"] for k in keys])
+                scores = matrix @ query
+                i = int(np.argmax(scores))
+                if scores[i] >= best_score:
+                    best_key, best_score = keys[i], float(scores[i])
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            self.hits += 1
+            self.saved_seconds += entry["latency"]
+            return entry
+
+    def store(self, query_vector, version, candidates, response, latency):
+        """Remember the answer to a query; `latency` is what producing it cost."""
+        with self._lock:
+            self._check_version(version)
+            self._entries[self._next_key] = {
+                "vector": self._normalize(query_vector),
+                "movie_ids": [c.get("movie_id") for c in candidates],
+                "candidates": candidates,
+                "response": response,
+                "latency": latency,
+                "created": time.time(),
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Counters for tuning the threshold."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": round(self.saved_seconds, 3),
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_semantic_cache():
+    """Return this worker's shared SemanticCache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+    return _cache
@@ -0,0 +1,234 @@
+"""
+Vector-store backends behind chroma_utils.
+
+Both backends answer `query()` with the same dict shape Chroma returns
+(`ids`, `documents`, `metadatas`, `distances`, one list per query vector),
+so callers do not care which one is active. Pick one with the
+VECTOR_BACKEND setting ("chroma" by default, or "numpy").
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from filmmate.metrics import span
+from .clients import reset_collections
+from .versions import get_active_collection, invalidate_alias, resolve_alias
+
+BACKEND = getattr(settings, "VECTOR_BACKEND", "chroma")
+NUMPY_DIR = getattr(settings, "VECTOR_NUMPY_DIR", os.path.join(settings.BASE_DIR, "vector_index"))
+# Seconds between checks whether ingest_chroma wrote a newer index file
+NUMPY_RELOAD_SECONDS = 10
+
+SIDECAR_FILE = "embeddings_meta.json"
+
+
+def first_chunk_id(movie_id):
+    """Id of a movie's first chunk (title, genres and the start of the plot)."""
+    return f"movie_{movie_id}_chunk_0"
+
+
+class ChromaStore:
+    """Queries the collection the alias points at through the pooled client."""
+
+    def query(self, query_embeddings, n_results, where=None, create=False):
+        kwargs = {"query_embeddings": query_embeddings, "n_results": n_results}
+        if where:
+            kwargs["where"] = where
+        with span("vector_query"):
+            try:
+                return get_active_collection(create=create).query(**kwargs)
+            except Exception:
+                # The cached handle or alias went stale (collection dropped after a
+                # switch); forget both and retry once with fresh ones.
+                invalidate_alias()
+                reset_collections()
+                return get_active_collection(create=create).query(**kwargs)
+
+    def embeddings(self, movie_ids):
+        """{movie_id: stored embedding of its first chunk} for the ids that are indexed."""
+        data = get_active_collection().get(
+            ids=[first_chunk_id(movie_id) for movie_id in movie_ids], include=["embeddings", "metadatas"]
+        )
+        return {
+            int(meta["movie_id"]): np.asarray(embedding, dtype=np.float32)
+            for embedding, meta in zip(data["embeddings"], data["metadatas"])
+        }
+
+    def version(self):
+        return resolve_alias()[1]
+
+
+class NumpyStore:
+    """
+    Brute-force search over a contiguous float32 matrix.
+
+    The matrix is memory-mapped from an `embeddings_v*.npy` file, so every worker on the
+    host shares the same page-cached file; ids, documents and metadata come
+    from a JSON sidecar. Both are written by `export_numpy_index`.
+    """
+
+    def __init__(self, directory=NUMPY_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._checked_at = 0.0
+        self._matrix = None
+        self._sq_norms = None
+        self._ids = []
+        self._documents = []
+        self._metadatas = []
+        self._columns = {}
+        self._rows = None
+        self._version = 0
+
+    def _sidecar_path(self):
+        return os.path.join(self.directory, SIDECAR_FILE)
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._matrix is not None and now - self._checked_at < NUMPY_RELOAD_SECONDS:
+            return
+        with self._lock:
+            self._checked_at = now
+            mtime = os.path.getmtime(self._sidecar_path())
+            if mtime == self._loaded_mtime:
+                return
+            with open(self._sidecar_path(), encoding="utf-8") as f:
+                sidecar = json.load(f)
+            matrix = np.load(os.path.join(self.directory, sidecar["embeddings_file"]), mmap_mode="r")
+            self._sq_norms = np.einsum("ij,ij->i", matrix, matrix)
+            self._matrix = matrix
+            self._ids = sidecar["ids"]
+            self._documents = sidecar["documents"]
+            self._metadatas = sidecar["metadatas"]
+            self._columns = {}
+            self._rows = None
+            self._version = sidecar.get("version", 0)
+            self._loaded_mtime = mtime
+
+    def _column(self, key):
+        column = self._columns.get(key)
+        if column is None:
+            column = np.array([m.get(key) for m in self._metadatas], dtype=object)
+            self._columns[key] = column
+        return column
+
+    def _mask(self, where):
+        """Boolean row mask for a Chroma-style `where` filter (equality, $eq/$ne/$in/$nin)."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            column = self._column(key)
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                if op == "$eq":
+                    mask &= column == value
+                elif op == "$ne":
+                    mask &= column != value
+                elif op == "$in":
+                    mask &= np.isin(column, list(value))
+                elif op == "$nin":
+                    mask &= ~np.isin(column, list(value))
+                else:
+                    raise ValueError(f"Unsupported filter operator: {op}")
+        return mask
+
+    def query(self, query_embeddings, n_results, where=None, create=False):
+        with span("vector_query"):
+            return self._query(query_embeddings, n_results, where)
+
+    def _query(self, query_embeddings, n_results, where):
+        self._ensure_loaded()
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        rows = np.flatnonzero(self._mask(where)) if where else None
+        matrix = self._matrix if rows is None else self._matrix[rows]
+        sq_norms = self._sq_norms if rows is None else self._sq_norms[rows]
+
+        # Squared L2 distance, the same metric Chroma uses by default
+        distances = (
+            np.einsum("ij,ij->i", queries, queries)[:, None]
+            - 2.0 * queries @ matrix.T
+            + sq_norms[None, :]
+        )
+        k = min(n_results, distances.shape[1])
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for row in distances:
+            if k == 0:
+                top = np.array([], dtype=int)
+            else:
+                top = np.argpartition(row, k - 1)[:k]
+                top = top[np.argsort(row[top])]
+            picked = top if rows is None else rows[top]
+            result["ids"].append([self._ids[i] for i in picked])
+            result["documents"].append([self._documents[i] for i in picked])
+            result["metadatas"].append([self._metadatas[i] for i in picked])
+            result["distances"].append(row[top].tolist())
+        return result
+
+    def embeddings(self, movie_ids):
+        """{movie_id: stored embedding of its first chunk} for the ids that are indexed."""
+        self._ensure_loaded()
+        rows = self._rows
+        if rows is None:
+            rows = self._rows = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        found = {movie_id: rows[first_chunk_id(movie_id)] for movie_id in movie_ids if first_chunk_id(movie_id) in rows}
+        return {movie_id: np.array(self._matrix[i]) for movie_id, i in found.items()}
+
+    def version(self):
+        self._ensure_loaded()
+        return self._version
+
+
+def export_numpy_index(collection, version, directory=NUMPY_DIR):
+    """
+    Dump `collection` into the files NumpyStore reads.
+
+    Files are written under new names and the sidecar is swapped in last with
+    os.replace, so running workers never see a half-written index.
+    """
+    os.makedirs(directory, exist_ok=True)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+    matrix = np.asarray(data["embeddings"], dtype=np.float32)
+
+    # Unique name: an incremental run keeps the version, and workers may
+    # still have the previous file memory-mapped
+    embeddings_file = f"embeddings_v{version}_{time.time_ns()}.npy"
+    np.save(os.path.join(directory, embeddings_file), matrix)
+
+    sidecar_tmp = os.path.join(directory, SIDECAR_FILE + ".tmp")
+    with open(sidecar_tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "embeddings_file": embeddings_file,
+            "ids": data["ids"],
+            "documents": data["documents"],
+            "metadatas": data["metadatas"],
+        }, f)
+    os.replace(sidecar_tmp, os.path.join(directory, SIDECAR_FILE))
+
+    # Older matrices are no longer referenced by the sidecar
+    for name in os.listdir(directory):
+        if name.startswith("embeddings_v") and name.endswith(".npy") and name != embeddings_file:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+    return len(data["ids"])
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_vector_store():
+    """Return this worker's vector store for the configured backend."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = NumpyStore() if BACKEND == "numpy" else ChromaStore()
+    return _store
@@ -0,0 +1,185 @@
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from movies.models import VectorCollectionAlias
+from .clients import COLLECTION_NAME, get_chroma_client, get_collection
+
+# Seconds a worker trusts its cached alias before re-reading it from the DB
+ALIAS_CACHE_SECONDS = getattr(settings, "VECTOR_ALIAS_CACHE_SECONDS", 30)
+# Seconds a retired collection is kept around for requests still using it
+RETIRED_GRACE_SECONDS = getattr(settings, "VECTOR_RETIRED_GRACE_SECONDS", 3600)
+
+_VERSION_RE = re.compile(rf"^{COLLECTION_NAME}_v(\d+)$")
+
+_lock = threading.Lock()
+_cached_alias = None  # (collection_name, version, generation, resolved_at)
+
+
+def versioned_name(version):
+    return f"{COLLECTION_NAME}_v{version}"
+
+
+def version_of(collection_name):
+    """N of `movies_collection_v<N>`; 0 for the legacy unversioned collection."""
+    match = _VERSION_RE.match(collection_name)
+    return int(match.group(1)) if match else 0
+
+
+def _alias_state():
+    global _cached_alias
+    cached = _cached_alias
+    if cached is not None and time.monotonic() - cached[3] < ALIAS_CACHE_SECONDS:
+        return cached[:3]
+
+    row = VectorCollectionAlias.objects.filter(alias=COLLECTION_NAME).first()
+    if row is None:
+        state = (COLLECTION_NAME, 0, 0)
+    else:
+        state = (row.collection_name, row.version, row.generation)
+    with _lock:
+        _cached_alias = (*state, time.monotonic())
+    return state
+
+
+def resolve_alias():
+    """
+    Return (collection_name, version) the alias currently points at.
+
+    Cached per worker for ALIAS_CACHE_SECONDS. Before the first blue-green
+    ingest there is no alias row and the legacy unversioned collection
+    (version 0) is used.
+    """
+    name, version, _ = _alias_state()
+    return name, version
+
+
+def content_version():
+    """
+    (version, generation) of the live collection's contents: moves on an
+    alias switch and on every in-place `--incremental` ingest, so caches of
+    answers retrieved from it can key on it (same caching as resolve_alias).
+    """
+    _, version, generation = _alias_state()
+    return version, generation
+
+
+def bump_generation():
+    """Record an in-place edit of the live collection (see content_version)."""
+    with transaction.atomic():
+        VectorCollectionAlias.objects.get_or_create(
+            alias=COLLECTION_NAME, defaults={"collection_name": COLLECTION_NAME, "version": 0},
+        )
+        VectorCollectionAlias.objects.filter(alias=COLLECTION_NAME).update(generation=F("generation") + 1)
+    invalidate_alias()
+
+
+def invalidate_alias():
+    """Forget the cached alias so the next call re-reads it."""
+    global _cached_alias
+    with _lock:
+        _cached_alias = None
+
+
+def get_active_collection(create=False):
+    """Return a warm handle to the collection the alias points at."""
+    name, _ = resolve_alias()
+    return get_collection(name, create=create)
+
+
+def _existing_versions(client):
+    versions = []
+    for name in client.list_collections():
+        name = str(name)
+        match = _VERSION_RE.match(name)
+        if match:
+            versions.append(int(match.group(1)))
+    return versions
+
+
+def create_versioned_collection(expected_chunks):
+    """
+    Create the next `movies_collection_v<N>` for a rebuild.
+
+    The expected chunk count is stored in the collection metadata so the
+    build can be validated before it is activated (also after a retry run).
+    """
+    client = get_chroma_client()
+    with transaction.atomic():
+        # The alias row doubles as a lock: a concurrent ingest waits here until
+        # this one's collection exists, then numbers its own after it. Without
+        # a row yet, create the one resolve_alias implies (legacy, version 0).
+        VectorCollectionAlias.objects.get_or_create(
+            alias=COLLECTION_NAME, defaults={"collection_name": COLLECTION_NAME, "version": 0},
+        )
+        row = VectorCollectionAlias.objects.select_for_update().get(alias=COLLECTION_NAME)
+        version = max([row.version] + _existing_versions(client)) + 1
+        collection = client.create_collection(
+            name=versioned_name(version),
+            metadata={"source": "movies", "expected_chunks": expected_chunks, "created_at": time.time()},
+        )
+    return collection, version
+
+
+def is_complete(collection):
+    """A build is complete when it holds every chunk it was created for."""
+    expected = (collection.metadata or {}).get("expected_chunks")
+    return expected is not None and collection.count() >= expected
+
+
+def activate(collection_name):
+    """
+    Point the alias at `collection_name` in one atomic DB update and mark
+    the previously active collection as retired.
+    """
+    version = version_of(collection_name)
+
+    with transaction.atomic():
+        row = VectorCollectionAlias.objects.select_for_update().filter(alias=COLLECTION_NAME).first()
+        previous = row.collection_name if row else COLLECTION_NAME
+        VectorCollectionAlias.objects.update_or_create(
+            alias=COLLECTION_NAME,
+            defaults={"collection_name": collection_name, "version": version},
+        )
+    invalidate_alias()
+
+    if previous != collection_name:
+        try:
+            old = get_chroma_client().get_collection(previous)
+            old.modify(metadata={**(old.metadata or {}), "retired_at": time.time()})
+        except Exception:
+            pass
+    return version
+
+
+def garbage_collect(grace_seconds=RETIRED_GRACE_SECONDS):
+    """
+    Delete retired collections (and never-activated builds older than the
+    live one) once they are older than the grace period. Returns the
+    deleted names.
+
+    Never-activated builds newer than the live one are kept: they are still
+    being filled by another ingest, or held back until `ingest_chroma
+    --retry-failed` completes them.
+    """
+    client = get_chroma_client()
+    invalidate_alias()
+    active, active_version = resolve_alias()
+    now = time.time()
+    deleted = []
+    for name in client.list_collections():
+        name = str(name)
+        if name == active or not (_VERSION_RE.match(name) or name == COLLECTION_NAME):
+            continue
+        metadata = client.get_collection(name).metadata or {}
+        if metadata.get("retired_at") is None and version_of(name) > active_version:
+            continue
+        since = metadata.get("retired_at") or metadata.get("created_at")
+        if since is not None and now - since > grace_seconds:
+            client.delete_collection(name)
+            deleted.append(name)
+    return deleted
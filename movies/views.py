@@ -1,24 +1,39 @@
 import json 
+import logging
 from django.shortcuts import get_object_or_404, render, redirect
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt 
 from django.views.decorators.http import require_POST 
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.cache import cache_control
 
-from movies.models import Movie, WatchedMovie
-from genres.models import Genre
+from movies.models import Movie, WatchedMovie, SimilarMovie
 from lists.models import List
 from reviews.forms import ReviewForm
 from users.models import FriendRequest
-from .vector.chroma_utils import get_recommendation, find_similar_movies_by_content
+from feed.services import feed_for
+from filmmate.metrics import span
+from filmmate.pagination import CursorPaginator, paginate_list
+from .autocomplete import titles
+from .catalog import get_catalog
+from .collaborative import also_watched, recommend_for_user
+from .overlay import MAX_IDS, WATCHLIST_NAME, movie_states
+from .rankings import ranked_movies
+from .search import hybrid_search, movies_in_order
+from .taste import for_you
+from .vector.chroma_utils import astream_recommendation, get_recommendation, find_similar_movies_by_content
+from .vector.semantic_cache import get_semantic_cache
+
+logger = logging.getLogger(__name__)
 
 
 def movie_home(request):
     """Homepage showing popular films and recent friend activity."""
-    popular_films = Movie.objects.all()[7:14]
+    # Materialized by refresh_rankings; before the first refresh fall back to rating
+    popular_films = ranked_movies(7) or Movie.objects.order_by('-rating', '-rating_count')[:7]
     friend_activities = []
+    for_you_films = []
 
     pending_requests = []
     if request.user.is_authenticated:
@@ -29,39 +44,31 @@ def movie_home(request):
             .order_by('-created')
         )
 
-        # Friends activity
-        friends = request.user.friends.all()
+        # Up to 7 most recent friend events, from the user's own feed rows
+        friend_activities = feed_for(request.user)[:7]
 
-        # Get up to 7 most recent movies watched by friends
-        friend_activities = (
-            WatchedMovie.objects.filter(user__in=friends)
-            .select_related('user', 'movie')
-            .order_by('-watched_at')[:7]
-        )
+        # Nearest movies to the user's taste vector; co-watch neighbours when
+        # there is no taste yet (or the vector store is down)
+        for_you_films = get_catalog().in_order(for_you(request.user) or recommend_for_user(request.user, limit=7))
 
     context = {
         'popular_films': popular_films,
+        'for_you_films': for_you_films,
         'friend_activities': friend_activities,
         'pending_requests': pending_requests,
     }
-    return render(request, 'movies/home.html', context)
+    with span('render'):
+        return render(request, 'movies/home.html', context)
 
 @login_required
 def friends_activity(request):
-    friends = request.user.friends.all()
-    activities = (
-        WatchedMovie.objects.filter(user__in=friends)
-        .select_related('user', 'movie')
-        .order_by('-watched_at')
-    )
-    paginator = Paginator(activities, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(feed_for(request.user), 20, ('-created', '-id'))
+    page_obj = paginator.page(request.GET.get('cursor'))
 
     return render(request, 'movies/friends_activity.html', {'page_obj': page_obj})
 
 def movie_list(request):
-    movies = Movie.objects.all()
+    movies = get_catalog().sorted('title')
     context = {
         'movies': movies,
     }
@@ -70,7 +77,7 @@ def movie_list(request):
 def movie_search(request):
     query = request.GET.get('q', '').strip()
     if query:
-        results = Movie.objects.filter(title__icontains=query)
+        results = movies_in_order(hybrid_search(query)[:21])
     else:
         results = Movie.objects.none() 
 
@@ -84,19 +91,64 @@ def movie_search(request):
     return render(request, 'movies/home.html', context)
 
 
+@cache_control(public=True, max_age=60)
+def title_autocomplete(request):
+    """Movie titles starting with (a word starting with) `q`, from the in-memory index."""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse([], safe=False)
+    return JsonResponse(titles.search(query, limit=8), safe=False)
+
+
+@login_required
+@cache_control(private=True, max_age=0)
+def movie_states_api(request):
+    """Watched / watchlisted / rating state of up to MAX_IDS movies: ?ids=1,2,3"""
+    movie_ids = []
+    for value in request.GET.getlist('ids'):
+        movie_ids.extend(int(part) for part in value.split(',') if part.strip().isdigit())
+    movie_ids = list(dict.fromkeys(movie_ids))[:MAX_IDS]
+    states = movie_states(request, movie_ids)
+    return JsonResponse({str(movie_id): state for movie_id, state in states.items()})
+
+
+def get_similar_movies(movie, top_k=4):
+    """
+    Return up to top_k similar movies as {'id', 'title', 'year', 'poster'} dicts.
+
+    Reads the table precomputed by `build_similar_movies`; movies that have no
+    stored neighbours yet fall back to a live vector search.
+    """
+    entries = (
+        SimilarMovie.objects.filter(movie=movie)
+        .select_related('similar')
+        .order_by('rank')[:top_k]
+    )
+    similar_movies = [
+        {
+            'id': e.similar.id,
+            'title': e.similar.title,
+            'year': e.similar.year,
+            'poster': e.similar.poster,
+        }
+        for e in entries
+    ]
+    if similar_movies:
+        return similar_movies
+
+    genre_names = " ".join([g.name for g in movie.genres.all()])
+    search_text = f"{movie.title} {genre_names} {movie.description}"
+    return find_similar_movies_by_content(search_text, movie.id, top_k=top_k)
+
+
 def movie_detail(request, pk):
     """Show movie details + reviews + toggle watchlist + mark as watched + submit review + SIMILAR MOVIES."""
     movie = get_object_or_404(Movie, pk=pk)
     reviews = movie.review_set.all().select_related("user").order_by("-date")
 
-    if request.user.is_authenticated:
-        watchlist, _ = List.objects.get_or_create(user=request.user, name="Watchlist")
-        in_watchlist = movie in watchlist.movies.all()
-
-        watched = WatchedMovie.objects.filter(user=request.user, movie=movie).exists()
-    else:
-        in_watchlist = False
-        watched = False
+    state = movie_states(request, [movie.id])[movie.id]
+    in_watchlist = state['watchlisted']
+    watched = state['watched']
 
     form = ReviewForm()
 
@@ -105,6 +157,7 @@ def movie_detail(request, pk):
             return redirect('users:login')
 
         action = request.POST.get('action')
+        watchlist, _ = List.objects.get_or_create(user=request.user, name=WATCHLIST_NAME)
 
         if action == 'toggle_watchlist':
             if in_watchlist:
@@ -125,18 +178,14 @@ def movie_detail(request, pk):
                 review = form.save(commit=False)
                 review.user = request.user
                 review.movie = movie
+                # Movie.rating is kept up to date by the review signals
                 review.save()
 
-                avg_rating = movie.review_set.aggregate(Avg("rating"))["rating__avg"] or 0
-                movie.rating = round(avg_rating, 1)
-                movie.save(update_fields=["rating"])
-
                 return redirect('movies:movie_detail', pk=pk)
 
-    genre_names = " ".join([g.name for g in movie.genres.all()])
-    search_text = f"{movie.title} {genre_names} {movie.description}"
-
-    similar_movies = find_similar_movies_by_content(search_text, movie.id, top_k=4)
+    similar_movies = get_similar_movies(movie, top_k=4)
+    # From watch/review history, precomputed by build_cowatched_movies
+    cowatched_movies = also_watched(movie, limit=4)
 
     context = {
         'movie': movie,
@@ -145,8 +194,10 @@ def movie_detail(request, pk):
         'watched': watched,
         'form': form,
         'similar_movies': similar_movies, # <-- Подаваме ги към темплейта
+        'cowatched_movies': cowatched_movies,
     }
-    return render(request, 'movies/movie_detail.html', context)
+    with span('render'):
+        return render(request, 'movies/movie_detail.html', context)
 
 
 @login_required
@@ -180,39 +231,61 @@ def my_films(request):
     return render(request, "movies/my_films.html", context)
 
 
-def movies_all(request):
-    query = request.GET.get('q', '')
-    genre_filter = request.GET.get('genre', '')
-    sort = request.GET.get('sort', 'title')
+def _int_param(request, name):
+    try:
+        return int(request.GET.get(name, ''))
+    except ValueError:
+        return None
 
-    movies = Movie.objects.all()
 
-    # Search
+def movies_all(request):
+    query = request.GET.get('q', '')
+    sort = request.GET.get('sort', 'relevance' if query else 'title')
+    # Facet filters: any number of genres (all of them or any of them) and a year range
+    match_all = request.GET.get('match') == 'all'
+    year_min = _int_param(request, 'year_min')
+    year_max = _int_param(request, 'year_max')
+
+    # Listing, filters and counts all come from the worker's catalog snapshot
+    catalog = get_catalog()
+    index = catalog.facets
+    genres = index.genre_keys(request.GET.getlist('genre'))
+    base_bits = index.all_bits
+
+    # Search: hybrid lexical + vector ranking, best matches first
     if query:
-        movies = movies.filter(title__icontains=query)
-
-    # Filter by genre
-    if genre_filter:
-        movies = movies.filter(genres__name__iexact=genre_filter).distinct()
+        ranked_ids = hybrid_search(query)
+        base_bits = index.ids_bits(ranked_ids)
 
-    # Sorting
-    if sort in ['title', 'year', 'director']:
-        movies = movies.order_by(sort)
+    facets = index.facets(base_bits, genres, match_all, year_min, year_max)
 
-    # Pagination
-    paginator = Paginator(movies, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    genres = Genre.objects.all()
-
-    return render(request, 'movies/movies_all.html', {
-        'page_obj': page_obj,
-        'genres': genres,
-        'query': query,
-        'genre_filter': genre_filter,
-        'sort': sort,
-    })
+    cursor = request.GET.get('cursor')
+    if query and sort == 'relevance':
+        entries = catalog.filter(catalog.in_order(ranked_ids), genres, match_all, year_min, year_max)
+        page_obj = paginate_list(entries, 12, cursor)
+    else:
+        if sort not in ['title', 'year', 'director']:
+            sort = 'title'
+        result_bits = base_bits & index.genre_filter_bits(genres, match_all) \
+            & index.year_filter_bits(year_min, year_max)
+        page_obj = catalog.select(result_bits, sort).page(12, cursor)
+
+    # Current filters, for the pagination links
+    params = request.GET.copy()
+    params.pop('cursor', None)
+
+    with span('render'):
+        return render(request, 'movies/movies_all.html', {
+            'page_obj': page_obj,
+            'facets': facets,
+            'query': query,
+            'genre_filter': [index.genre_names[key] for key in genres],
+            'match': 'all' if match_all else 'any',
+            'year_min': year_min,
+            'year_max': year_max,
+            'sort': sort,
+            'filter_query': params.urlencode(),
+        })
 
 # --- AI RECOMMENDATION API (UPDATED) ---
 
@@ -235,6 +308,46 @@ def recommend_movie_api(request):
             'movies': ai_data.get('recommendations', [])
         })
 
-    except Exception as e:
-        print(f"Error: {e}")
-        return JsonResponse({'status': 'error', 'message': 'Server error.'}, status=500)
\ No newline at end of file
+    except Exception:
+        logger.exception("Recommendation API request failed")
+        return JsonResponse({'status': 'error', 'message': 'Server error.'}, status=500)
+
+
+def _sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@csrf_exempt
+@require_POST
+async def recommend_movie_stream_api(request):
+    """
+    Streaming variant of recommend_movie_api (served by filmmate/asgi.py).
+
+    Sends the retrieved candidate movies first, then the answer text as it is
+    generated, and finally the parsed recommendations, as server-sent events.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid request.'}, status=400)
+    user_query = data.get('message', '').strip()
+
+    if not user_query:
+        return JsonResponse({'status': 'error', 'message': 'Please say something!'}, status=400)
+
+    async def events():
+        async for event, payload in astream_recommendation(user_query):
+            yield _sse(event, payload)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+def recommend_cache_stats(request):
+    """Hit ratio and saved latency of this worker's chatbot answer cache."""
+    return JsonResponse(get_semantic_cache().stats())
@@ -8,6 +8,8 @@ class Review(models.Model):
     text = models.TextField()
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 11)])
     date = models.DateTimeField(auto_now_add=True)
+    # Last create or edit; recalculate_movie_ratings --since scopes on it
+    updated = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.movie.title} - {self.user.username} ({self.rating}/10)"
@@ -0,0 +1,60 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from movies.rankings import REVIEW_WEIGHT
+from movies.tasks import apply_review_change, queue_taste_update, record_movie_activity
+from .models import Review
+
+
+def _remember_rating(review):
+    loaded = review.pk and 'rating' in review.__dict__ and 'movie_id' in review.__dict__
+    review._counted = (review.movie_id, review.rating) if loaded else None
+
+
+@receiver(post_init, sender=Review)
+def review_loaded(sender, instance, **kwargs):
+    # What this review currently contributes to the movie's counters
+    _remember_rating(instance)
+
+
+def previous_rating(review):
+    """
+    (movie_id, rating) a review being saved has in the database, or None
+    for a new one. Call it from pre_save, before the save overwrites them.
+    """
+    if review._state.adding:
+        return None
+    # Loaded with deferred fields: read the stored values
+    if getattr(review, '_counted', None) is None:
+        review._counted = Review.objects.filter(pk=review.pk).values_list('movie_id', 'rating').first()
+    return review._counted
+
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance, **kwargs):
+    previous_rating(instance)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    # Counters, popularity and taste are caught up by the job worker
+    counted = None if created else getattr(instance, '_counted', None)
+    if counted is None:
+        apply_review_change.enqueue(instance.movie_id, added=instance.rating)
+    elif counted[0] != instance.movie_id:
+        apply_review_change.enqueue(counted[0], removed=counted[1])
+        apply_review_change.enqueue(instance.movie_id, added=instance.rating)
+    elif counted[1] != instance.rating:
+        apply_review_change.enqueue(instance.movie_id, added=instance.rating, removed=counted[1])
+    if created:
+        record_movie_activity.enqueue(instance.movie_id, REVIEW_WEIGHT, when=instance.date)
+    if counted != (instance.movie_id, instance.rating):
+        queue_taste_update(instance.user_id, [instance.movie_id, counted[0] if counted else None])
+    _remember_rating(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    counted = getattr(instance, '_counted', None) or (instance.movie_id, instance.rating)
+    apply_review_change.enqueue(counted[0], removed=counted[1])
+    queue_taste_update(instance.user_id, [counted[0]])
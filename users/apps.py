@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from . import signals  # noqa: F401
+        from .autocomplete import usernames
+        post_save.connect(usernames.invalidate, sender=self.get_model('CustomUser'), dispatch_uid='users_autocomplete_save')
+        post_delete.connect(usernames.invalidate, sender=self.get_model('CustomUser'), dispatch_uid='users_autocomplete_delete')
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+
+from filmmate.autocomplete import AutocompleteSource
+
+
+def _username_entries(users):
+    for username in users.values_list('username', flat=True):
+        yield username, username
+
+
+def _users_stamp():
+    # updated_at catches renames; the count catches deletions
+    users = get_user_model().objects.aggregate(n=Count('pk'), last=Max('pk'), edited=Max('updated_at'))
+    return tuple(users.values())
+
+
+usernames = AutocompleteSource(get_user_model(), _username_entries, fields=['username'], stamp=_users_stamp)
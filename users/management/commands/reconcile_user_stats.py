@@ -0,0 +1,61 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import UserStats
+from users.stats import COUNTERS, compute_stats
+
+FIELDS = COUNTERS + ('genre_counts',)
+
+
+class Command(BaseCommand):
+    help = 'Recompute every UserStats row from the source tables and fix any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report the rows that drifted without writing them')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk UPDATE/INSERT (default: 1000)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        batch_size = options['batch_size']
+
+        expected = compute_stats()
+        existing = {stats.user_id: stats for stats in UserStats.objects.all()}
+        empty = {name: 0 for name in COUNTERS} | {'genre_counts': {}}
+
+        created, updated = [], []
+        for user_id in get_user_model().objects.values_list('pk', flat=True):
+            values = expected.get(user_id, empty)
+            stats = existing.get(user_id)
+            if stats is None:
+                created.append(UserStats(user_id=user_id, **values))
+                continue
+            drift = {name: (getattr(stats, name), values[name]) for name in FIELDS if getattr(stats, name) != values[name]}
+            if drift:
+                if options['dry_run'] and len(updated) < 20:
+                    self.stdout.write(f'  user {user_id}: ' + ', '.join(
+                        f'{name} {old!r} -> {new!r}' for name, (old, new) in drift.items()
+                    ))
+                for name, value in values.items():
+                    setattr(stats, name, value)
+                updated.append(stats)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {len(updated)} rows drifted, {len(created)} missing '
+                f'({time.perf_counter() - started:.2f}s). Nothing was written.'
+            ))
+            return
+
+        with transaction.atomic():
+            UserStats.objects.bulk_update(updated, FIELDS, batch_size=batch_size)
+            UserStats.objects.bulk_create(created, batch_size=batch_size, ignore_conflicts=True)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {len(updated)} drifted and created {len(created)} missing rows '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
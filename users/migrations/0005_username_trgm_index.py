@@ -0,0 +1,28 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+def add_username_index(apps, schema_editor):
+    # Postgres only; SQLite keeps using icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = schema_editor.quote_name(apps.get_model('users', 'CustomUser')._meta.db_table)
+    schema_editor.execute(f"CREATE INDEX users_customuser_username_trgm ON {table} USING GIN (username gin_trgm_ops)")
+
+
+def remove_username_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS users_customuser_username_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_friendrequest_id'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_username_index, remove_username_index),
+    ]
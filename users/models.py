@@ -11,6 +11,9 @@ class CustomUser(AbstractUser):
         related_name='friends_rel',
         help_text='Users you are friends with'
     )
+    # Last profile save; logins only write last_login, so they leave it alone
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
     def __str__(self):
         return self.username
 
@@ -27,4 +30,33 @@ class FriendRequest(models.Model):
         ]
 
     def __str__(self):
-        return f"FriendRequest(from={self.from_user_id}, to={self.to_user_id})"
\ No newline at end of file
+        return f"FriendRequest(from={self.from_user_id}, to={self.to_user_id})"
+
+
+class UserStats(models.Model):
+    """
+    Profile counters for one user, kept current by the write paths (see
+    users.stats) and checked by the reconcile_user_stats command.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='stats')
+    watched_count = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    # Sum of the ratings the user gave, for the average
+    rating_sum = models.PositiveIntegerField(default=0)
+    list_count = models.PositiveIntegerField(default=0)
+    friend_count = models.PositiveIntegerField(default=0)
+    # {genre name: watched movies in that genre}
+    genre_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.review_count, 1) if self.review_count else None
+
+    def top_genres(self, n=3):
+        counts = [(name, count) for name, count in self.genre_counts.items() if count > 0]
+        return [name for name, _ in sorted(counts, key=lambda item: (-item[1], item[0]))[:n]]
+
+    def __str__(self):
+        return f"stats of {self.user.username}"
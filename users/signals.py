@@ -0,0 +1,62 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from lists.models import List
+from movies.models import WatchedMovie
+from reviews.models import Review
+from reviews.signals import previous_rating
+from .stats import apply_watch, bump, set_friend_counts
+
+
+@receiver(post_save, sender=WatchedMovie)
+def watched_movie_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_watch(instance.user_id, instance.movie_id, 1)
+
+
+@receiver(post_delete, sender=WatchedMovie)
+def watched_movie_deleted(sender, instance, **kwargs):
+    apply_watch(instance.user_id, instance.movie_id, -1)
+
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance, **kwargs):
+    # The stored rating, so an edit only adds the difference
+    previous = previous_rating(instance)
+    instance._stats_rating = previous[1] if previous else None
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.user_id, review_count=1, rating_sum=instance.rating)
+    elif instance._stats_rating is not None:
+        bump(instance.user_id, rating_sum=instance.rating - instance._stats_rating)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    bump(instance.user_id, review_count=-1, rating_sum=-instance.rating)
+
+
+@receiver(post_save, sender=List)
+def list_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.user_id, list_count=1)
+
+
+@receiver(post_delete, sender=List)
+def list_deleted(sender, instance, **kwargs):
+    bump(instance.user_id, list_count=-1)
+
+
+@receiver(m2m_changed, sender=get_user_model().friends.through)
+def friends_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # Forward changes move instance's count; reverse ones (b.friends_rel.add(a)) move theirs
+    if action == 'pre_clear' and reverse:
+        instance._stats_friend_of = list(instance.friends_rel.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        set_friend_counts(list(pk_set) if reverse else [instance.pk])
+    elif action == 'post_clear':
+        set_friend_counts(getattr(instance, '_stats_friend_of', []) if reverse else [instance.pk])
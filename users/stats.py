@@ -0,0 +1,121 @@
+"""
+Per-user profile counters (UserStats).
+
+The signals in users.signals adjust a user's row on every watch, review,
+list and friendship write, so a profile reads one row instead of counting
+the whole history. Rows are only ever updated from signals, never created
+there; a user without one gets it computed from scratch on their first
+profile view. `compute_stats` is the from-scratch version, used for that
+and by the reconcile_user_stats command.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from lists.models import List
+from movies.models import Movie, WatchedMovie
+from reviews.models import Review
+from users.models import UserStats
+
+Friendship = get_user_model().friends.through
+MovieGenre = Movie.genres.through
+
+COUNTERS = ("watched_count", "review_count", "rating_sum", "list_count", "friend_count")
+
+
+def compute_stats(user_ids=None):
+    """{user_id: {field: value}} computed from the source tables, one GROUP BY per counter."""
+    def scoped(queryset, field="user_id"):
+        return queryset if user_ids is None else queryset.filter(**{f"{field}__in": user_ids})
+
+    stats = {}
+
+    def row(user_id):
+        return stats.setdefault(user_id, {name: 0 for name in COUNTERS} | {"genre_counts": {}})
+
+    for user_id, n in scoped(WatchedMovie.objects).values("user_id").annotate(n=Count("id")).values_list("user_id", "n"):
+        row(user_id)["watched_count"] = n
+    for user_id, n, total in (
+        scoped(Review.objects).values("user_id").annotate(n=Count("id"), total=Sum("rating"))
+        .values_list("user_id", "n", "total")
+    ):
+        row(user_id).update(review_count=n, rating_sum=total or 0)
+    for user_id, n in scoped(List.objects).values("user_id").annotate(n=Count("id")).values_list("user_id", "n"):
+        row(user_id)["list_count"] = n
+    for user_id, n in (
+        scoped(Friendship.objects, "from_customuser_id").values("from_customuser_id").annotate(n=Count("id"))
+        .values_list("from_customuser_id", "n")
+    ):
+        row(user_id)["friend_count"] = n
+
+    genres = movie_genre_names()
+    for user_id, movie_id in scoped(WatchedMovie.objects).values_list("user_id", "movie_id").iterator(chunk_size=5000):
+        counts = row(user_id)["genre_counts"]
+        for name in genres.get(movie_id, ()):
+            counts[name] = counts.get(name, 0) + 1
+    return stats
+
+
+def movie_genre_names(movie_ids=None):
+    """
+    {movie_id: [genre name]} read from the genre links themselves (all
+    movies when `movie_ids` is None). Genre rows differing only in case
+    count once, under the name of the oldest.
+    """
+    links = MovieGenre.objects.order_by("genre_id")
+    if movie_ids is not None:
+        links = links.filter(movie_id__in=movie_ids)
+    names = {}
+    for movie_id, name in links.values_list("movie_id", "genre__name").iterator(chunk_size=5000):
+        movie_names = names.setdefault(movie_id, [])
+        if all(name.lower() != seen.lower() for seen in movie_names):
+            movie_names.append(name)
+    return names
+
+
+def rebuild_stats(user_id):
+    values = compute_stats([user_id]).get(user_id) or {name: 0 for name in COUNTERS} | {"genre_counts": {}}
+    stats, _ = UserStats.objects.update_or_create(user_id=user_id, defaults=values)
+    return stats
+
+
+def get_stats(user):
+    """The user's UserStats row, computing it on first use."""
+    return UserStats.objects.filter(user=user).first() or rebuild_stats(user.pk)
+
+
+def bump(user_id, **deltas):
+    """Add `deltas` to a user's counters in one UPDATE (no-op for users without a row)."""
+    UserStats.objects.filter(user_id=user_id).update(
+        **{name: Greatest(F(name) + delta, 0) for name, delta in deltas.items() if delta}
+    )
+
+
+def apply_watch(user_id, movie_id, delta):
+    """A watch was added (delta=1) or removed (delta=-1): count it and its genres."""
+    # Not the catalog snapshot: it can be a minute behind a new or re-tagged movie
+    names = movie_genre_names([movie_id]).get(movie_id, [])
+    with transaction.atomic():
+        stats = UserStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            return
+        stats.watched_count = max(0, stats.watched_count + delta)
+        counts = stats.genre_counts
+        for name in names:
+            count = counts.get(name, 0) + delta
+            if count > 0:
+                counts[name] = count
+            else:
+                counts.pop(name, None)
+        stats.save(update_fields=["watched_count", "genre_counts", "updated_at"])
+
+
+def set_friend_counts(user_ids):
+    """Recount friends for `user_ids` (friendship changes are rare; a count is exact and cheap)."""
+    counts = dict(
+        Friendship.objects.filter(from_customuser_id__in=user_ids).values("from_customuser_id")
+        .annotate(n=Count("id")).values_list("from_customuser_id", "n")
+    )
+    for user_id in user_ids:
+        UserStats.objects.filter(user_id=user_id).update(friend_count=counts.get(user_id, 0))
@@ -12,11 +12,19 @@ from reviews.models import Review
 from lists.models import List
 from django.http import JsonResponse
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
 from movies.models import WatchedMovie
+from users.autocomplete import usernames
+from users.stats import get_stats
+from django.views.decorators.cache import cache_control
 
 
 User = get_user_model()
 
+# Friends shown on a profile; the full count comes from UserStats
+PROFILE_FRIENDS = 12
+
 def signup_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -96,10 +104,11 @@ def send_friend_request_by_username(request):
 @require_POST
 def accept_friend_request(request, fr_id):
     fr = get_object_or_404(FriendRequest, pk=fr_id, to_user=request.user)
-    # add each other as friends
-    fr.to_user.friends.add(fr.from_user)
-    fr.from_user.friends.add(fr.to_user)
-    fr.delete()
+    # add each other as friends; the feed backfill jobs are queued with it
+    with transaction.atomic():
+        fr.to_user.friends.add(fr.from_user)
+        fr.from_user.friends.add(fr.to_user)
+        fr.delete()
     messages.success(request, 'Friend request accepted.')
     return redirect(reverse('users:friend_requests'))
 
@@ -165,8 +174,9 @@ def profile_view(request, user_id=None):
         .order_by('-watched_at')[:4]
     )
 
-    friends = profile_user.friends.all()
-    seen_movies_count = recent_watched_movies.count()
+    friends = profile_user.friends.all()[:PROFILE_FRIENDS]
+    # Counters and top genres come from one precomputed row
+    stats = get_stats(profile_user)
 
     is_own_profile = (profile_user == request.user)
     is_friend = request.user.friends.filter(pk=profile_user.pk).exists() if not is_own_profile else False
@@ -187,16 +197,32 @@ def profile_view(request, user_id=None):
         'recent_watchlist_movies': watchlist_movies,
         'recent_watched_movies': recent_watched_movies,
         'friends': friends,
-        'seen_movies_count': seen_movies_count,
+        'stats': stats,
+        'seen_movies_count': stats.watched_count,
     }
     return render(request, 'users/profile.html', context)
 
 
 @login_required
+@cache_control(private=True, max_age=30)
 def username_autocomplete(request):
     query = request.GET.get('q', '')
     if len(query) < 2:
         return JsonResponse([], safe=False)
-    users = User.objects.filter(username__icontains=query)[:5]  
+    # Prefix matches come from this worker's in-memory index (no queries)
+    results = usernames.search(query, limit=5)
+    if results or len(query) < 3:
+        return JsonResponse(results, safe=False)
+
+    # No prefix match (typo, mid-word): fall back to the database
+    if connection.vendor == 'postgresql':
+        # Ranked trigram match, served by the GIN index from migration 0005
+        users = (
+            User.objects.filter(username__trigram_word_similar=query)
+            .annotate(similarity=TrigramWordSimilarity(query, 'username'))
+            .order_by('-similarity', 'username')[:5]
+        )
+    else:
+        users = User.objects.filter(username__icontains=query)[:5]
     results = list(users.values_list('username', flat=True))
     return JsonResponse(results, safe=False)
\ No newline at end of file